@@ -1,48 +1,97 @@
-import re
 from pathlib import Path
 
 from flask import Flask
-from sqlalchemy import text
+from sqlalchemy import event, text
 
 from app.models import db
-from .auth.routes import auth_blueprint
-from .auth.middleware import require_auth
-from .sensors.light.routes import light_blueprint
-from .sensors.pump.routes import pump_blueprint
-from .sensors.distance.routes import distance_blueprint
-from .sensors.temperature.routes import temperature_blueprint
-from .sensors.humidity.routes import humidity_blueprint
-from .sensors.pcb_temp.routes import pcb_temp_blueprint
-from .sensors.camera.routes import camera_blueprint
-from .schedules.routes import schedule_blueprint
-from .settings.routes import settings_blueprint
-from .plant_of_the_day.routes import plant_of_the_day_blueprint
-from .history.routes import history_blueprint
-from .backup.routes import backup_blueprint
-
-
-def _migrate_app_settings_slack(app):
-    """Add Slack-related columns to app_settings if missing (for existing DBs)."""
-    from app.models import db
-    with db.engine.connect() as conn:
+
+
+# Used for any setting the project config module doesn't define (or when config.py is absent)
+_CONFIG_DEFAULTS = {
+    "SECRET_KEY": "dev-secret",
+    "AUTH_ENABLED": False,
+    "ALLOW_NEW_USERS": True,
+    "SQLALCHEMY_DATABASE_URI": "sqlite:///instance/garden.db",
+    "WEBAUTHN_RP_ID": "localhost",
+    "WEBAUTHN_ORIGIN": "http://localhost:5173",
+    "WEBAUTHN_RP_ID_LOCAL": "localhost",
+    "WEBAUTHN_ORIGIN_LOCAL": "http://localhost:5173",
+    "WEBAUTHN_RP_ID_PROD": "",
+    "WEBAUTHN_ORIGIN_PROD": "",
+    "ENVIRONMENT": "",
+    "WEBAUTHN_RP_NAME": "Garden of Eden",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_EXPIRY_HOURS": 24,
+    "ALLOWED_EMAILS": [],
+    "PLANT_API_KEY": "",
+}
+
+
+# Bump when adding a migration step; stored in SQLite's PRAGMA user_version
+_SCHEMA_VERSION = 2
+
+# Columns added to app_settings after the first release: (name, SQL type/constraints)
+_SLACK_COLUMNS = (
+    ("slack_webhook_url", "TEXT"),
+    ("slack_cooldown_minutes", "INTEGER NOT NULL DEFAULT 15"),
+    ("slack_notifications_enabled", "INTEGER NOT NULL DEFAULT 1"),
+    ("slack_runtime_errors_enabled", "INTEGER NOT NULL DEFAULT 0"),
+    ("plant_of_the_day_slack_time", "TEXT NOT NULL DEFAULT '09:35'"),
+)
+
+# Indexes added in schema version 2 (create_all doesn't add indexes to existing tables): (name, table, column)
+_HISTORY_INDEXES = (
+    ("ix_sensor_readings_created_at", "sensor_readings", "created_at"),
+    ("ix_pump_events_created_at", "pump_events", "created_at"),
+)
+
+
+def _migrate_schema(app):
+    """Bring an existing DB up to _SCHEMA_VERSION: Slack columns on app_settings (v1), created_at indexes (v2)."""
+    # AUTOCOMMIT leaves pysqlite's own transaction handling off, so the explicit BEGIN below really
+    # wraps the ALTERs, CREATE INDEXes and the version stamp (SQLite DDL is transactional)
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
         try:
+            version = conn.execute(text("PRAGMA user_version")).scalar() or 0
+            if version >= _SCHEMA_VERSION:
+                return
             r = conn.execute(text("PRAGMA table_info(app_settings)"))
             cols = {row[1] for row in r}
         except Exception:
             return
-        for col, spec in [
-            ("slack_webhook_url", "TEXT"),
-            ("slack_cooldown_minutes", "INTEGER NOT NULL DEFAULT 15"),
-            ("slack_notifications_enabled", "INTEGER NOT NULL DEFAULT 1"),
-            ("slack_runtime_errors_enabled", "INTEGER NOT NULL DEFAULT 0"),
-            ("plant_of_the_day_slack_time", "TEXT NOT NULL DEFAULT '09:35'"),
-        ]:
-            if col not in cols:
-                try:
-                    conn.execute(text(f"ALTER TABLE app_settings ADD COLUMN {col} {spec}"))
-                    conn.commit()
-                except Exception:
-                    conn.rollback()
+        missing = [(col, spec) for col, spec in _SLACK_COLUMNS if col not in cols]
+        # One transaction (one journal sync) for all steps plus the version stamp; a failed step
+        # rolls the whole migration back
+        conn.exec_driver_sql("BEGIN")
+        try:
+            for col, spec in missing:
+                conn.exec_driver_sql(f"ALTER TABLE app_settings ADD COLUMN {col} {spec}")
+            if version < 2:
+                for name, table, column in _HISTORY_INDEXES:
+                    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+            conn.exec_driver_sql(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+
+
+# Applied to every new SQLite connection. WAL + synchronous=NORMAL means a commit appends to the
+# WAL without an fsync (only checkpoints sync), which is the dominant write cost on an SD card.
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
 
 
 def _register_error_handlers(app):
@@ -62,12 +111,11 @@ def _normalize_sqlite_uri(uri: str) -> str:
     For SQLite URIs, resolve the path to absolute (relative to project root) and ensure
     the database directory exists. Returns the URI to use (absolute path so CWD doesn't matter).
     """
-    if not uri or not uri.startswith("sqlite"):
+    prefix = "sqlite:///"
+    if not uri or not uri.startswith(prefix) or len(uri) == len(prefix):
         return uri
-    match = re.match(r"sqlite:///(.+)$", uri)
-    if not match:
-        return uri
-    path = Path(match.group(1))
+    # "sqlite:////abs/path" leaves "/abs/path", which is already absolute
+    path = Path(uri[len(prefix):])
     if not path.is_absolute():
         root = Path(__file__).resolve().parent.parent
         path = (root / path).resolve()
@@ -76,51 +124,56 @@ def _normalize_sqlite_uri(uri: str) -> str:
     return f"sqlite:///{path}"
 
 
-def create_app(config_name):
+_CONFIG = None
+
+
+def _build_config():
+    """Merge config.py over _CONFIG_DEFAULTS once per process; later apps reuse the result."""
+    global _CONFIG
+    if _CONFIG is None:
+        try:
+            import config as project_config
+        except ImportError:
+            project_config = None
+        cfg = {k: getattr(project_config, k, v) for k, v in _CONFIG_DEFAULTS.items()}
+        cfg["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        cfg["SQLALCHEMY_DATABASE_URI"] = _normalize_sqlite_uri(cfg["SQLALCHEMY_DATABASE_URI"])
+        # Normalized once for O(1) membership checks during passkey registration
+        cfg["ALLOWED_EMAILS_SET"] = frozenset(
+            e.strip().lower() for e in cfg["ALLOWED_EMAILS"] or () if e and e.strip()
+        )
+        _CONFIG = cfg
+    return _CONFIG
+
+
+def create_app(config_name=None):
+    """Build the Flask app. config_name is accepted for existing callers but not used."""
     app = Flask(__name__)
-    try:
-        import config as project_config
-        app.config["SECRET_KEY"] = project_config.SECRET_KEY
-        app.config["AUTH_ENABLED"] = project_config.AUTH_ENABLED
-        app.config["ALLOW_NEW_USERS"] = getattr(project_config, "ALLOW_NEW_USERS", True)
-        app.config["SQLALCHEMY_DATABASE_URI"] = project_config.SQLALCHEMY_DATABASE_URI
-        app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-        app.config["WEBAUTHN_RP_ID"] = project_config.WEBAUTHN_RP_ID
-        app.config["WEBAUTHN_ORIGIN"] = project_config.WEBAUTHN_ORIGIN
-        app.config["WEBAUTHN_RP_ID_LOCAL"] = getattr(project_config, "WEBAUTHN_RP_ID_LOCAL", "localhost")
-        app.config["WEBAUTHN_ORIGIN_LOCAL"] = getattr(project_config, "WEBAUTHN_ORIGIN_LOCAL", "http://localhost:5173")
-        app.config["WEBAUTHN_RP_ID_PROD"] = getattr(project_config, "WEBAUTHN_RP_ID_PROD", "")
-        app.config["WEBAUTHN_ORIGIN_PROD"] = getattr(project_config, "WEBAUTHN_ORIGIN_PROD", "")
-        app.config["ENVIRONMENT"] = getattr(project_config, "ENVIRONMENT", "")
-        app.config["WEBAUTHN_RP_NAME"] = getattr(project_config, "WEBAUTHN_RP_NAME", "Garden of Eden")
-        app.config["JWT_ALGORITHM"] = project_config.JWT_ALGORITHM
-        app.config["JWT_EXPIRY_HOURS"] = project_config.JWT_EXPIRY_HOURS
-        app.config["ALLOWED_EMAILS"] = getattr(project_config, "ALLOWED_EMAILS", [])
-        app.config["PLANT_API_KEY"] = getattr(project_config, "PLANT_API_KEY", "")
-        app.config["SQLALCHEMY_DATABASE_URI"] = _normalize_sqlite_uri(app.config["SQLALCHEMY_DATABASE_URI"])
-    except ImportError:
-        app.config["SECRET_KEY"] = "dev-secret"
-        app.config["AUTH_ENABLED"] = False
-        app.config["ALLOW_NEW_USERS"] = True
-        app.config["SQLALCHEMY_DATABASE_URI"] = _normalize_sqlite_uri("sqlite:///instance/garden.db")
-        app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-        app.config["WEBAUTHN_RP_ID"] = "localhost"
-        app.config["WEBAUTHN_ORIGIN"] = "http://localhost:5173"
-        app.config["WEBAUTHN_RP_ID_LOCAL"] = "localhost"
-        app.config["WEBAUTHN_ORIGIN_LOCAL"] = "http://localhost:5173"
-        app.config["WEBAUTHN_RP_ID_PROD"] = ""
-        app.config["WEBAUTHN_ORIGIN_PROD"] = ""
-        app.config["ENVIRONMENT"] = ""
-        app.config["WEBAUTHN_RP_NAME"] = "Garden of Eden"
-        app.config["JWT_ALGORITHM"] = "HS256"
-        app.config["JWT_EXPIRY_HOURS"] = 24
-        app.config["ALLOWED_EMAILS"] = []
-        app.config["PLANT_API_KEY"] = ""
+    app.config.update(_build_config())
 
     db.init_app(app)
     with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", _set_sqlite_pragmas)
         db.create_all()
-        _migrate_app_settings_slack(app)
+        _migrate_schema(app)
+
+    # Blueprints are imported here rather than at module level so importing the app
+    # package (e.g. for models or scripts) doesn't initialise sensor hardware drivers.
+    from .auth.routes import auth_blueprint
+    from .auth.middleware import require_auth
+    from .sensors.light.routes import light_blueprint
+    from .sensors.pump.routes import pump_blueprint
+    from .sensors.distance.routes import distance_blueprint
+    from .sensors.temperature.routes import temperature_blueprint
+    from .sensors.humidity.routes import humidity_blueprint
+    from .sensors.pcb_temp.routes import pcb_temp_blueprint
+    from .sensors.camera.routes import camera_blueprint
+    from .schedules.routes import schedule_blueprint
+    from .settings.routes import settings_blueprint
+    from .plant_of_the_day.routes import plant_of_the_day_blueprint
+    from .history.routes import history_blueprint
+    from .backup.routes import backup_blueprint
 
     require_auth(app)
     _register_error_handlers(app)
@@ -2,12 +2,16 @@
 Persistent state for threshold alerts: in_alarm and last_sent times per key.
 Used to send only on transition to alarm (or recovery) and to enforce cooldown.
 """
-import json
 import logging
+import os
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from threading import Lock
 
+from app.lib import json_codec
+
 logger = logging.getLogger(__name__)
 
 FILENAME = "alert_state.json"
@@ -24,38 +28,102 @@ ALERT_KEYS = (
 
 _lock = Lock()
 
+# In-memory copy of the state file, keyed on (path, inode, mtime_ns) so a write by another process
+# (e.g. the debug reloader's second scheduler) invalidates it
+_CACHE = None
+_CACHE_KEY = None
+_DIRTY = False
+
 
 def _state_path(app):
     return Path(app.instance_path) / FILENAME
 
 
-def _load(app):
-    path = _state_path(app)
+def _file_key(path):
+    try:
+        st = path.stat()
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_ino, st.st_mtime_ns)
+
+
+def _read_file(path):
     if not path.exists():
         return {}
     try:
-        with open(path, "r") as f:
-            return json.load(f)
+        return json_codec.loads(path.read_bytes())
     except Exception as e:
         logger.warning("Could not load alert state %s: %s", path, e)
         return {}
 
 
-def _save(app, data):
-    path = _state_path(app)
+def _write_file(path, data):
+    """Write data to path atomically (temp file + os.replace)."""
     try:
         path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(json_codec.dumps(data))
+        os.replace(tmp, path)
+        return True
     except Exception as e:
         logger.warning("Could not save alert state %s: %s", path, e)
+        return False
 
 
-def get_state(app, key):
-    """Return dict with in_alarm (bool), last_sent_at (ISO str or None), last_recovery_at (ISO str or None)."""
+def _load(app):
+    """Return the cached state dict, re-reading the file only when it has changed on disk (one stat per call)."""
+    global _CACHE, _CACHE_KEY
+    path = _state_path(app)
+    key = _file_key(path)
+    if _CACHE is None or _CACHE_KEY != key:
+        _CACHE = _read_file(path)
+        _CACHE_KEY = key
+    return _CACHE
+
+
+def _save(app, data):
+    """Replace the cached state with data and write it to disk."""
+    global _CACHE, _DIRTY
+    _CACHE = data
+    _DIRTY = True
+    _flush(app)
+
+
+def _flush(app):
+    """Write the cached state to disk if it changed since the last write."""
+    global _DIRTY, _CACHE_KEY
+    if not _DIRTY or _CACHE is None:
+        return
+    path = _state_path(app)
+    if _write_file(path, _CACHE):
+        _DIRTY = False
+        _CACHE_KEY = _file_key(path)
+
+
+def snapshot_state(app):
+    """Return a copy of all alert state entries ({key: {in_alarm, last_sent_at, last_recovery_at}})."""
     with _lock:
         data = _load(app)
-    entry = data.get(key) or {}
+        return {key: dict(entry or {}) for key, entry in data.items()}
+
+
+@contextmanager
+def transaction(app):
+    """
+    Hold the state lock and yield the state dict for get/set calls below.
+    Mutations are written to disk once, when the block exits.
+    """
+    with _lock:
+        st = _load(app)
+        try:
+            yield st
+        finally:
+            _flush(app)
+
+
+def get_state(st, key):
+    """Return dict with in_alarm (bool), last_sent_at (ISO str or None), last_recovery_at (ISO str or None)."""
+    entry = st.get(key) or {}
     return {
         "in_alarm": bool(entry.get("in_alarm")),
         "last_sent_at": entry.get("last_sent_at"),
@@ -63,60 +131,75 @@ def get_state(app, key):
     }
 
 
-def set_alarm_sent(app, key):
+# time.monotonic() value for each ISO timestamp in the state, so cooldown checks are a
+# single float subtraction. Setters record the value they write; timestamps loaded
+# from disk are parsed once and mapped onto the monotonic clock.
+_mono_times = {}
+
+
+def _now_iso():
+    iso = datetime.utcnow().isoformat() + "Z"
+    if len(_mono_times) > 64:
+        _mono_times.clear()
+    _mono_times[iso] = time.monotonic()
+    return iso
+
+
+def _mono_time(iso_str):
+    mono = _mono_times.get(iso_str)
+    if mono is None:
+        dt = datetime.fromisoformat(iso_str.replace("Z", "+00:00"))
+        if dt.tzinfo:
+            dt = dt.replace(tzinfo=None)  # naive compare with utcnow
+        mono = time.monotonic() - (datetime.utcnow() - dt).total_seconds()
+        _mono_times[iso_str] = mono
+    return mono
+
+
+def set_alarm_sent(st, key):
     """Mark key as in alarm and set last_sent_at to now."""
-    with _lock:
-        data = _load(app)
-        data.setdefault(key, {})["in_alarm"] = True
-        data[key]["last_sent_at"] = datetime.utcnow().isoformat() + "Z"
-        _save(app, data)
+    global _DIRTY
+    st.setdefault(key, {})["in_alarm"] = True
+    st[key]["last_sent_at"] = _now_iso()
+    _DIRTY = True
 
 
-def set_recovery_sent(app, key):
+def set_recovery_sent(st, key):
     """Mark key as not in alarm and set last_recovery_at to now."""
-    with _lock:
-        data = _load(app)
-        data.setdefault(key, {})["in_alarm"] = False
-        data[key]["last_recovery_at"] = datetime.utcnow().isoformat() + "Z"
-        _save(app, data)
+    global _DIRTY
+    st.setdefault(key, {})["in_alarm"] = False
+    st[key]["last_recovery_at"] = _now_iso()
+    _DIRTY = True
 
 
-def set_in_alarm(app, key, in_alarm):
+def set_in_alarm(st, key, in_alarm):
     """Update in_alarm flag without changing last_sent_at (e.g. when in alarm but cooldown prevented send)."""
-    with _lock:
-        data = _load(app)
-        data.setdefault(key, {})["in_alarm"] = bool(in_alarm)
-        _save(app, data)
+    global _DIRTY
+    st.setdefault(key, {})["in_alarm"] = bool(in_alarm)
+    _DIRTY = True
+
+
+def _seconds_since(iso_str):
+    return time.monotonic() - _mono_time(iso_str)
 
 
-def can_send_alert(app, key, cooldown_minutes):
+def can_send_alert(st, key, cooldown_minutes):
     """True if we have not sent an alert for this key within cooldown_minutes."""
-    state = get_state(app, key)
+    state = get_state(st, key)
     if not state["last_sent_at"]:
         return True
     try:
-        last = datetime.fromisoformat(state["last_sent_at"].replace("Z", "+00:00"))
-        from datetime import timezone
-        if last.tzinfo:
-            last = last.replace(tzinfo=None)  # naive compare with utcnow
-        else:
-            last = last
-        delta_min = (datetime.utcnow() - last).total_seconds() / 60
-        return delta_min >= cooldown_minutes
+        return _seconds_since(state["last_sent_at"]) >= cooldown_minutes * 60
     except Exception:
         return True
 
 
-def can_send_recovery(app, key, cooldown_minutes):
+def can_send_recovery(st, key, cooldown_minutes):
     """True if we have not sent a recovery for this key within cooldown_minutes."""
-    state = get_state(app, key)
-    if not state.get("last_recovery_at"):
+    state = get_state(st, key)
+    if not state["last_recovery_at"]:
         return True
     try:
-        last = datetime.fromisoformat(state["last_recovery_at"].replace("Z", "+00:00"))
-        if last.tzinfo:
-            last = last.replace(tzinfo=None)
-        delta_min = (datetime.utcnow() - last).total_seconds() / 60
-        return delta_min >= cooldown_minutes
+        return _seconds_since(state["last_recovery_at"]) >= cooldown_minutes * 60
     except Exception:
         return True
@@ -2,59 +2,159 @@
 Send messages to Slack via Incoming Webhook.
 URL: from AppSettings.slack_webhook_url (if set) else SLACK_WEBHOOK_URL env.
 """
-import json
 import logging
 import os
-import urllib.request
-import urllib.error
+import queue
+from collections import namedtuple
+from contextlib import nullcontext
+from threading import Lock, Thread
+from time import monotonic
+
+from flask import current_app, has_app_context
+
+from app.lib import http_pool, json_codec
 
 logger = logging.getLogger(__name__)
 
+_TIMEOUT = 10
 
-def get_webhook_url(app):
-    """Return webhook URL from settings (if set and non-empty) else from env."""
-    with app.app_context():
-        from app.models import AppSettings
-        from app.settings.routes import _get_or_create
-        row = _get_or_create()
-        url = (row.slack_webhook_url or "").strip() if getattr(row, "slack_webhook_url", None) else None
-        if url:
-            return url
+# Outgoing messages are posted by one daemon thread so callers (request handlers, the
+# alert check) never wait on Slack. Items are (url, body, failure log prefix).
+_Q = queue.Queue(maxsize=64)
+_worker = None
+_worker_lock = Lock()
+
+# Read-only copy of the AppSettings fields used by Slack alerts, loaded once per alert cycle
+SettingsSnapshot = namedtuple(
+    "SettingsSnapshot",
+    [
+        "webhook_url",
+        "slack_notifications_enabled",
+        "slack_runtime_errors_enabled",
+        "slack_cooldown_minutes",
+        "water_level_alerts_enabled",
+        "water_alert_threshold",
+        "air_temp_alerts_enabled",
+        "air_temp_high_alert_threshold",
+        "air_temp_low_alert_threshold",
+        "humidity_alerts_enabled",
+        "humidity_low_alert_threshold",
+        "humidity_high_alert_threshold",
+        "pcb_temp_alerts_enabled",
+        "pcb_temp_alert_threshold",
+    ],
+)
+# Snapshot fields copied straight from the AppSettings row (everything but webhook_url)
+_ROW_FIELDS = SettingsSnapshot._fields[1:]
+
+
+def _post(url, body):
+    """
+    POST body (dict) as JSON to url, reusing a kept-alive connection to the host.
+    Returns (status, reason). Raises ValueError for a malformed URL, OSError or
+    http.client.HTTPException on network failure.
+    """
+    status, reason, _ = http_pool.request(
+        "POST", url, body=json_codec.dumps(body), headers={"Content-Type": "application/json"}, timeout=_TIMEOUT
+    )
+    return status, reason
+
+
+def _worker_loop():
+    while True:
+        url, body, label = _Q.get()
+        try:
+            status, reason = _post(url, body)
+            if status not in (200, 201, 204):
+                logger.warning("%s: Slack webhook returned %s %s", label, status, reason)
+        except Exception as e:
+            logger.warning("%s: %s", label, e)
+        finally:
+            _Q.task_done()
+
+
+def _enqueue(url, body, label):
+    """Queue body for posting to url in the background. Drops (and logs) if the queue is full."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = Thread(target=_worker_loop, name="slack-sender", daemon=True)
+            _worker.start()
+    try:
+        _Q.put_nowait((url, body, label))
+    except queue.Full:
+        logger.warning("Slack send queue full; dropping message")
+
+
+def _env_webhook_url():
     return (os.environ.get("SLACK_WEBHOOK_URL") or "").strip() or None
 
 
-def send_slack(app, text):
+def _app_context(app):
+    """app.app_context(), or a no-op if that app's context is already active (e.g. in a request)."""
+    if has_app_context() and current_app._get_current_object() is app:
+        return nullcontext()
+    return app.app_context()
+
+
+def _load_settings_snapshot(app, fresh_context=False):
     """
-    POST text to Slack. No-op if Slack is disabled or no webhook URL.
-    Does not raise; logs on failure.
+    Fetch the settings row once and return a SettingsSnapshot (webhook URL already resolved).
+    fresh_context pushes a new app context (and so a new session) even inside a request.
     """
-    with app.app_context():
-        from app.models import AppSettings
+    with app.app_context() if fresh_context else _app_context(app):
         from app.settings.routes import _get_or_create
         row = _get_or_create()
-        if not getattr(row, "slack_notifications_enabled", True):
-            return
-    url = get_webhook_url(app)
+        # Plain column reads, once; every field below is a mapped NOT NULL column on AppSettings
+        url = (row.slack_webhook_url or "").strip() or _env_webhook_url()
+        return SettingsSnapshot(url, *(getattr(row, name) for name in _ROW_FIELDS))
+
+
+# Most recent SettingsSnapshot: (app, expires_at on the monotonic clock, snapshot)
+_SETTINGS_TTL = 30  # seconds
+_settings_cache = None
+
+
+def _cached_settings(app, fresh_context=False):
+    """Return a SettingsSnapshot, re-reading the database at most every _SETTINGS_TTL seconds."""
+    global _settings_cache
+    cached = _settings_cache
+    now = monotonic()
+    if cached is not None and cached[0] is app and cached[1] > now:
+        return cached[2]
+    snapshot = _load_settings_snapshot(app, fresh_context)
+    _settings_cache = (app, now + _SETTINGS_TTL, snapshot)
+    return snapshot
+
+
+def invalidate_settings_cache():
+    """Drop the cached settings snapshot (call after AppSettings is saved or restored)."""
+    global _settings_cache
+    _settings_cache = None
+
+
+def get_webhook_url(app, settings=None):
+    """Return webhook URL from settings (if set and non-empty) else from env."""
+    if settings is None:
+        settings = _cached_settings(app)
+    return settings.webhook_url
+
+
+def send_slack(app, text, settings=None):
+    """
+    Queue text for posting to Slack. No-op if Slack is disabled or no webhook URL.
+    Pass a SettingsSnapshot to avoid re-reading settings from the database.
+    Returns immediately; failures are logged by the sender thread.
+    """
+    if settings is None:
+        settings = _cached_settings(app)
+    if not settings.slack_notifications_enabled:
+        return
+    url = settings.webhook_url
     if not url:
         logger.debug("Slack webhook URL not set; skipping message.")
         return
-    try:
-        body = {"text": text}
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(body).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            if resp.status not in (200, 201, 204):
-                logger.warning("Slack webhook returned %s", resp.status)
-    except urllib.error.HTTPError as e:
-        logger.warning("Slack webhook HTTP error: %s %s", e.code, e.reason)
-    except urllib.error.URLError as e:
-        logger.warning("Slack webhook URL error: %s", e.reason)
-    except Exception as e:
-        logger.warning("Slack send failed: %s", e)
+    _enqueue(url, {"text": text}, "Slack send failed")
 
 
 def send_test_slack(app, webhook_url_override=None):
@@ -71,35 +171,26 @@ def send_test_slack(app, webhook_url_override=None):
         "If you see this, Slack notifications are working."
     )
     try:
-        body = {"text": text}
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(body).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            if resp.status not in (200, 201, 204):
-                raise RuntimeError(f"Slack webhook returned status {resp.status}")
-    except urllib.error.HTTPError as e:
-        raise RuntimeError(f"Slack webhook error: {e.code} {e.reason}")
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Slack webhook error: {e.reason}")
-
-
-def send_runtime_error(app, exc, context="Server"):
+        status, reason = _post(url, {"text": text})
+    except Exception as e:
+        raise RuntimeError(f"Slack webhook error: {e}")
+    if status not in (200, 201, 204):
+        raise RuntimeError(f"Slack webhook error: {status} {reason}")
+
+
+def send_runtime_error(app, exc, context="Server", settings=None):
     """
     Send a runtime error notification to Slack if enabled in settings.
     Message is informative and uses emojis.
     """
-    with app.app_context():
-        from app.settings.routes import _get_or_create
-        row = _get_or_create()
-        if not getattr(row, "slack_notifications_enabled", True):
-            return
-        if not getattr(row, "slack_runtime_errors_enabled", False):
-            return
-    url = get_webhook_url(app)
+    if settings is None:
+        # Own app context: the failing request's session may be in a failed transaction
+        settings = _cached_settings(app, fresh_context=True)
+    if not settings.slack_notifications_enabled:
+        return
+    if not settings.slack_runtime_errors_enabled:
+        return
+    url = settings.webhook_url
     if not url:
         return
     exc_type = type(exc).__name__
@@ -111,15 +202,4 @@ def send_runtime_error(app, exc, context="Server"):
         f"*Message:* {exc_msg}\n"
         f"Check server logs for full traceback."
     )
-    try:
-        body = {"text": text}
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(body).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            pass
-    except Exception as e:
-        logger.warning("Failed to send Slack runtime error notification: %s", e)
+    _enqueue(url, {"text": text}, "Failed to send Slack runtime error notification")
@@ -3,52 +3,112 @@ Threshold alert check: read sensors, compare to settings, send Slack on transiti
 Respects per-category enabled flags and cooldown.
 """
 import logging
-from datetime import datetime
+import operator
+from concurrent.futures import ThreadPoolExecutor
 
 from . import alert_state
 from . import slack
 
 logger = logging.getLogger(__name__)
 
+_READ_TIMEOUT = 5  # seconds per sensor
 
-def _read_sensors(app):
-    """Return (water_distance_cm, air_temp_f, humidity_pct, pcb_temp_f). None for any read failure."""
-    water_cm = None
-    air_temp_f = None
-    humidity_pct = None
-    pcb_temp_f = None
-
-    try:
-        from app.sensors.distance.routes import distance_control
-        water_cm = distance_control.measure_once()
-    except Exception as e:
-        logger.debug("Alert check: distance read failed: %s", e)
-
-    try:
-        from app.sensors.temperature.routes import temperature_sensor
-        if temperature_sensor is not None:
-            t_c = temperature_sensor.read()
-            if t_c is not None:
-                air_temp_f = t_c * 9 / 5 + 32
-    except Exception as e:
-        logger.debug("Alert check: temperature read failed: %s", e)
-
-    try:
-        from app.sensors.humidity.routes import humidity_sensor
-        if humidity_sensor is not None:
-            humidity_pct = humidity_sensor.read()
-    except Exception as e:
-        logger.debug("Alert check: humidity read failed: %s", e)
-
-    try:
-        from app.sensors.pcb_temp.pcb_temp import get_pcb_temperature
-        t_c = get_pcb_temperature()
-        if t_c is not None:
-            pcb_temp_f = t_c * 9 / 5 + 32
-    except Exception as e:
-        logger.debug("Alert check: pcb temp read failed: %s", e)
-
-    return water_cm, air_temp_f, humidity_pct, pcb_temp_f
+
+def _read_water_cm():
+    from app.sensors.distance.routes import distance_control
+    return distance_control.measure_once()
+
+
+def _read_air_temp_f():
+    from app.sensors.temperature.routes import temperature_sensor
+    if temperature_sensor is None:
+        return None
+    t_c = temperature_sensor.read()
+    return t_c * 9 / 5 + 32 if t_c is not None else None
+
+
+def _read_humidity_pct():
+    from app.sensors.humidity.routes import humidity_sensor
+    if humidity_sensor is None:
+        return None
+    return humidity_sensor.read()
+
+
+def _read_pcb_temp_f():
+    from app.sensors.pcb_temp.pcb_temp import get_pcb_temperature
+    t_c = get_pcb_temperature()
+    return t_c * 9 / 5 + 32 if t_c is not None else None
+
+
+# (reader, log label) in the order _read_sensors returns them
+_SENSOR_READERS = (
+    (_read_water_cm, "distance"),
+    (_read_air_temp_f, "temperature"),
+    (_read_humidity_pct, "humidity"),
+    (_read_pcb_temp_f, "pcb temp"),
+)
+
+# Reused across alert cycles; the reads are blocking I/O so they overlap well in threads
+_executor = ThreadPoolExecutor(max_workers=len(_SENSOR_READERS), thread_name_prefix="alert-sensor")
+
+
+def _read_sensors(app, need_water=True, need_air=True, need_hum=True, need_pcb=True):
+    """
+    Return (water_distance_cm, air_temp_f, humidity_pct, pcb_temp_f). None for any read failure
+    or for a sensor whose need_* flag is False (that sensor is not touched).
+    """
+    needed = (need_water, need_air, need_hum, need_pcb)
+    futures = [
+        (_executor.submit(reader) if need else None, label)
+        for (reader, label), need in zip(_SENSOR_READERS, needed)
+    ]
+    results = []
+    for future, label in futures:
+        if future is None:
+            results.append(None)
+            continue
+        try:
+            results.append(future.result(timeout=_READ_TIMEOUT))
+        except Exception as e:
+            logger.debug("Alert check: %s read failed: %s", label, e)
+            results.append(None)
+    return tuple(results)
+
+
+# (alert key, reading index in _read_sensors, enabled attr, threshold attr, in_alarm(value, threshold),
+#  alert message, recovery message). Messages are formatted with v=value, t=threshold.
+_RULES = (
+    (
+        "water_low", 0, "water_level_alerts_enabled", "water_alert_threshold", operator.ge,
+        "💧 *Gardyn – Water level low*\nCurrent: {v:.1f} cm (threshold: {t} cm). Consider refilling.",
+        "✅ *Gardyn – Water level OK*\nBack to normal ({v:.1f} cm).",
+    ),
+    (
+        "air_temp_high", 1, "air_temp_alerts_enabled", "air_temp_high_alert_threshold", operator.gt,
+        "🌡️ *Gardyn – Air temperature high*\nCurrent: {v:.1f}°F (threshold: {t}°F).",
+        "✅ *Gardyn – Air temperature OK*\nBack to normal ({v:.1f}°F).",
+    ),
+    (
+        "air_temp_low", 1, "air_temp_alerts_enabled", "air_temp_low_alert_threshold", operator.lt,
+        "🥶 *Gardyn – Air temperature low*\nCurrent: {v:.1f}°F (threshold: {t}°F).",
+        "✅ *Gardyn – Air temperature OK*\nBack to normal ({v:.1f}°F).",
+    ),
+    (
+        "humidity_low", 2, "humidity_alerts_enabled", "humidity_low_alert_threshold", operator.lt,
+        "💨 *Gardyn – Humidity low*\nCurrent: {v:.1f}% (threshold: {t}%).",
+        "✅ *Gardyn – Humidity OK*\nBack to normal ({v:.1f}%).",
+    ),
+    (
+        "humidity_high", 2, "humidity_alerts_enabled", "humidity_high_alert_threshold", operator.gt,
+        "💦 *Gardyn – Humidity high*\nCurrent: {v:.1f}% (threshold: {t}%).",
+        "✅ *Gardyn – Humidity OK*\nBack to normal ({v:.1f}%).",
+    ),
+    (
+        "pcb_temp_high", 3, "pcb_temp_alerts_enabled", "pcb_temp_alert_threshold", operator.gt,
+        "🔥 *Gardyn – PCB temperature high*\nCurrent: {v:.1f}°F (threshold: {t}°F). Check ventilation.",
+        "✅ *Gardyn – PCB temperature OK*\nBack to normal ({v:.1f}°F).",
+    ),
+)
 
 
 def run_alert_check(app):
@@ -57,86 +117,35 @@ def run_alert_check(app):
     Only sends when Slack notifications are enabled and webhook is set.
     Uses cooldown and transition logic (alert on OK->breach, recovery on breach->OK).
     """
-    # Load settings from database (single source of truth for thresholds and toggles)
-    with app.app_context():
-        from app.settings.routes import _get_or_create
-        row = _get_or_create()
-        if not getattr(row, "slack_notifications_enabled", True):
-            return
-        cooldown = max(1, min(120, getattr(row, "slack_cooldown_minutes", 15)))
-    water_cm, air_temp_f, humidity_pct, pcb_temp_f = _read_sensors(app)
-
-    # Thresholds and enabled flags from DB (row from _get_or_create())
-    with app.app_context():
-        from app.settings.routes import _get_or_create
-        row = _get_or_create()
-
-    def check(key, in_alarm, enabled, send_alert_fn, send_recovery_fn):
-        if not enabled:
-            return
-        state = alert_state.get_state(app, key)
-        was_in_alarm = state["in_alarm"]
-        if in_alarm and not was_in_alarm:
-            if alert_state.can_send_alert(app, key, cooldown):
-                send_alert_fn()
-                alert_state.set_alarm_sent(app, key)
-            else:
-                alert_state.set_in_alarm(app, key, True)
-        elif not in_alarm and was_in_alarm:
-            if alert_state.can_send_recovery(app, key, cooldown):
-                send_recovery_fn()
-                alert_state.set_recovery_sent(app, key)
-
-    # Water level (low = distance >= threshold); thresholds from DB row
-    water_enabled = getattr(row, "water_level_alerts_enabled", False)
-    water_thresh = getattr(row, "water_alert_threshold", 12.0)
-    water_low = water_cm is not None and water_cm >= water_thresh
-    def send_water_alert():
-        slack.send_slack(app, f"💧 *Gardyn – Water level low*\nCurrent: {water_cm:.1f} cm (threshold: {water_thresh} cm). Consider refilling.")
-    def send_water_recovery():
-        slack.send_slack(app, f"✅ *Gardyn – Water level OK*\nBack to normal ({water_cm:.1f} cm).")
-    check("water_low", water_low, water_enabled, send_water_alert, send_water_recovery)
-
-    # Air temp (thresholds from DB row)
-    air_enabled = getattr(row, "air_temp_alerts_enabled", False)
-    air_high_thresh = getattr(row, "air_temp_high_alert_threshold", 80.0)
-    air_low_thresh = getattr(row, "air_temp_low_alert_threshold", 65.0)
-    air_high = air_temp_f is not None and air_temp_f > air_high_thresh
-    air_low = air_temp_f is not None and air_temp_f < air_low_thresh
-    def send_air_high():
-        slack.send_slack(app, f"🌡️ *Gardyn – Air temperature high*\nCurrent: {air_temp_f:.1f}°F (threshold: {air_high_thresh}°F).")
-    def send_air_high_recovery():
-        slack.send_slack(app, f"✅ *Gardyn – Air temperature OK*\nBack to normal ({air_temp_f:.1f}°F).")
-    def send_air_low():
-        slack.send_slack(app, f"🥶 *Gardyn – Air temperature low*\nCurrent: {air_temp_f:.1f}°F (threshold: {air_low_thresh}°F).")
-    def send_air_low_recovery():
-        slack.send_slack(app, f"✅ *Gardyn – Air temperature OK*\nBack to normal ({air_temp_f:.1f}°F).")
-    check("air_temp_high", air_high, air_enabled, send_air_high, send_air_high_recovery)
-    check("air_temp_low", air_low, air_enabled, send_air_low, send_air_low_recovery)
-
-    # Humidity (thresholds from DB row)
-    hum_enabled = getattr(row, "humidity_alerts_enabled", False)
-    hum_low_thresh = getattr(row, "humidity_low_alert_threshold", 40.0)
-    hum_high_thresh = getattr(row, "humidity_high_alert_threshold", 90.0)
-    hum_low = humidity_pct is not None and humidity_pct < hum_low_thresh
-    hum_high = humidity_pct is not None and humidity_pct > hum_high_thresh
-    def send_hum_low():
-        slack.send_slack(app, f"💨 *Gardyn – Humidity low*\nCurrent: {humidity_pct:.1f}% (threshold: {hum_low_thresh}%).")
-    def send_hum_low_recovery():
-        slack.send_slack(app, f"✅ *Gardyn – Humidity OK*\nBack to normal ({humidity_pct:.1f}%).")
-    def send_hum_high():
-        slack.send_slack(app, f"💦 *Gardyn – Humidity high*\nCurrent: {humidity_pct:.1f}% (threshold: {hum_high_thresh}%).")
-    def send_hum_high_recovery():
-        slack.send_slack(app, f"✅ *Gardyn – Humidity OK*\nBack to normal ({humidity_pct:.1f}%).")
-    check("humidity_low", hum_low, hum_enabled, send_hum_low, send_hum_low_recovery)
-    check("humidity_high", hum_high, hum_enabled, send_hum_high, send_hum_high_recovery)
-
-    # PCB temp (threshold from DB row)
-    pcb_enabled = getattr(row, "pcb_temp_alerts_enabled", False)
-    pcb_thresh = getattr(row, "pcb_temp_alert_threshold", 110.0)
-    pcb_high = pcb_temp_f is not None and pcb_temp_f > pcb_thresh
-    def send_pcb_alert():
-        slack.send_slack(app, f"🔥 *Gardyn – PCB temperature high*\nCurrent: {pcb_temp_f:.1f}°F (threshold: {pcb_thresh}°F). Check ventilation.")
-    def send_pcb_recovery():
-        slack.send_slack(app, f"✅ *Gardyn – PCB temperature OK*\nBack to normal ({pcb_temp_f:.1f}°F).")
-    check("pcb_temp_high", pcb_high, pcb_enabled, send_pcb_alert, send_pcb_recovery)
+    # Load settings once per cycle (single source of truth for thresholds and toggles)
+    row = slack._cached_settings(app)
+    if not row.slack_notifications_enabled or not row.webhook_url:
+        return
+    need_water = row.water_level_alerts_enabled
+    need_air = row.air_temp_alerts_enabled
+    need_hum = row.humidity_alerts_enabled
+    need_pcb = row.pcb_temp_alerts_enabled
+    if not (need_water or need_air or need_hum or need_pcb):
+        return
+    cooldown = max(1, min(120, row.slack_cooldown_minutes))
+    readings = _read_sensors(app, need_water, need_air, need_hum, need_pcb)
+
+    # All state reads/writes for this cycle share one load and one write
+    with alert_state.transaction(app) as st:
+        for key, idx, enabled_attr, thresh_attr, breached, alert_msg, recovery_msg in _RULES:
+            if not getattr(row, enabled_attr):
+                continue
+            value = readings[idx]
+            threshold = getattr(row, thresh_attr)
+            in_alarm = value is not None and breached(value, threshold)
+            was_in_alarm = alert_state.get_state(st, key)["in_alarm"]
+            if in_alarm and not was_in_alarm:
+                if alert_state.can_send_alert(st, key, cooldown):
+                    slack.send_slack(app, alert_msg.format(v=value, t=threshold), settings=row)
+                    alert_state.set_alarm_sent(st, key)
+                else:
+                    alert_state.set_in_alarm(st, key, True)
+            elif not in_alarm and was_in_alarm and value is not None:
+                if alert_state.can_send_recovery(st, key, cooldown):
+                    slack.send_slack(app, recovery_msg.format(v=value, t=threshold), settings=row)
+                    alert_state.set_recovery_sent(st, key)
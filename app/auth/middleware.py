@@ -1,34 +1,74 @@
 """
 Require JWT for non-auth routes when AUTH_ENABLED is True.
 """
+import hashlib
 import logging
+import time
+from threading import Lock
+
 import jwt
 from flask import request, g, jsonify
 
 _log = logging.getLogger(__name__)
 
+# Routes under this prefix (passkey login/registration) are always public
+_AUTH_PREFIX = "/auth/"
+_AUTH_PREFIX_LEN = len(_AUTH_PREFIX)
+
+# Decoded payloads of recently verified tokens, so repeat requests skip the HMAC + JSON decode.
+# Key: truncated SHA-256 of (algorithm, secret, token). Value: (cached_until, exp as int or None, payload).
+_TOKEN_CACHE_TTL = 30  # seconds
+_TOKEN_CACHE_MAX = 10000
+_token_cache: dict[bytes, tuple[float, int | None, dict]] = {}
+_token_cache_lock = Lock()
+
+
+def _verify_cached(token: str, secret: str, algorithm: str) -> dict:
+    """
+    Verify token with jwt.decode, with a short-lived cache of successful results.
+    Raises jwt.InvalidTokenError (or a subclass) on failure.
+    """
+    key = hashlib.sha256(f"{algorithm}\0{secret}\0{token}".encode()).digest()[:16]
+    now = time.time()
+    with _token_cache_lock:
+        hit = _token_cache.get(key)
+    if hit is not None and hit[0] > now:
+        exp = hit[1]
+        if exp is not None and exp <= now:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return hit[2]
+    payload = jwt.decode(token, secret, algorithms=(algorithm,))
+    # jwt.decode has validated exp as an integer (numeric strings included)
+    exp = int(payload["exp"]) if "exp" in payload else None
+    with _token_cache_lock:
+        if len(_token_cache) >= _TOKEN_CACHE_MAX:
+            for k in [k for k, (until, _, _) in _token_cache.items() if until <= now]:
+                del _token_cache[k]
+            if len(_token_cache) >= _TOKEN_CACHE_MAX:
+                _token_cache.clear()
+        _token_cache[key] = (now + _TOKEN_CACHE_TTL, exp, payload)
+    return payload
+
 
 def require_auth(app):
     """Register before_request to enforce JWT on protected routes."""
+    config = app.config
 
     @app.before_request
     def _check_auth():
-        if not app.config.get("AUTH_ENABLED", True):
+        # Read per request so AUTH_ENABLED / SECRET_KEY changes after create_app take effect
+        if not config.get("AUTH_ENABLED", True):
             return None
         if request.method == "OPTIONS":
             return None  # Let CORS handle preflight; don't require auth
-        if request.path.startswith("/auth/"):
+        if request.path[:_AUTH_PREFIX_LEN] == _AUTH_PREFIX:
             return None
         auth = request.headers.get("Authorization")
         if not auth or not auth.startswith("Bearer "):
             return jsonify({"error": "Authentication required"}), 401
         token = auth[7:].strip()
         try:
-            payload = jwt.decode(
-                token,
-                app.config["SECRET_KEY"],
-                algorithms=[app.config["JWT_ALGORITHM"]],
-            )
+            payload = _verify_cached(token, config["SECRET_KEY"], config["JWT_ALGORITHM"])
             g.current_user_id = int(payload["sub"])
             g.current_user_name = payload.get("name", "")
         except jwt.InvalidTokenError as e:
@@ -5,6 +5,8 @@ import json
 import logging
 import os
 import secrets
+import time
+from threading import Lock
 from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify, current_app
 from webauthn import (
@@ -17,25 +19,46 @@ from webauthn import (
 )
 from webauthn.helpers.structs import (
     AuthenticatorSelectionCriteria,
+    PublicKeyCredentialDescriptor,
     ResidentKeyRequirement,
     UserVerificationRequirement,
 )
 import jwt
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
 
 from app.models import db, User, WebAuthnCredential
+from .middleware import _verify_cached
 
 auth_blueprint = Blueprint("auth", __name__, url_prefix="/auth")
 
 # User-facing message when registration is refused (email not in ALLOWED_EMAILS)
 REGISTRATION_REFUSED_MESSAGE = "Sorry, we're not accepting new users at this time!"
 
-# In-memory challenge storage (single process). Key: "registration" | "authentication"
-_challenges: dict[str, bytes] = {}
-# Store email for the in-progress registration (so register can find the user)
-_registration_email: str | None = None
+# Fixed authenticator requirements for registration; a value object, built once
+_AUTH_SELECTION = AuthenticatorSelectionCriteria(
+    resident_key=ResidentKeyRequirement.PREFERRED,
+    user_verification=UserVerificationRequirement.PREFERRED,
+)
+
+# In-memory challenge storage (single process), one entry per options request so concurrent
+# logins/registrations don't overwrite each other. Key: handle returned with the options.
+# Value: (expires_at, kind "registration" | "authentication", challenge, email for registration)
+_CHALLENGE_TTL = 300  # seconds
+_CHALLENGE_MAX = 4096
+_challenges: dict[str, tuple[float, str, bytes, str | None]] = {}
+# Newest handle per kind, for clients that don't echo the handle back. Those clients still share
+# one slot per kind: two overlapping option requests without handles race as before.
+_latest_handle: dict[str, str] = {}
+_challenges_lock = Lock()
 _log = logging.getLogger(__name__)
 
+# Credential descriptors for login_options, rebuilt only when credentials change.
+# (descriptors or None, version they were built at); version bumps on register/restore.
+_allow_creds_cache: tuple[list | None, int] | None = None
+_creds_version = 0
+_creds_lock = Lock()
+
 
 def _log_registration_refused(email: str) -> None:
     """Append a line to the registration-refused log file with request details."""
@@ -55,14 +78,15 @@ def _log_registration_refused(email: str) -> None:
 
 
 def _get_allowed_emails():
-    """List of allowed email addresses from config."""
-    return list(current_app.config.get("ALLOWED_EMAILS") or [])
+    """Frozenset of allowed (lowercased) email addresses, built by create_app; empty if registration is open."""
+    return current_app.config["ALLOWED_EMAILS_SET"]
 
 
-def _get_or_create_user_for_email(email: str):
-    """Get or create a user for the given allowed email."""
+def _get_or_create_user_for_email(email: str, allowed: frozenset | None = None):
+    """Get or create a user for the given allowed email. Pass allowed if the caller already looked it up."""
     email = email.strip().lower()
-    allowed = _get_allowed_emails()
+    if allowed is None:
+        allowed = _get_allowed_emails()
     if not allowed:
         # No ALLOWED_EMAILS: fall back to single admin user (backward compat)
         user = User.query.filter_by(email=None).first() or User.query.first()
@@ -85,32 +109,109 @@ def _get_or_create_user_for_email(email: str):
     return user
 
 
-def _get_webauthn_rp_id_and_origin():
+def _store_challenge(kind: str, challenge: bytes, email: str | None = None) -> str:
+    """Remember a challenge for kind and return the handle the client echoes back."""
+    handle = secrets.token_urlsafe(16)
+    now = time.monotonic()
+    with _challenges_lock:
+        if len(_challenges) >= _CHALLENGE_MAX:
+            for h in [h for h, entry in _challenges.items() if entry[0] <= now]:
+                del _challenges[h]
+            if len(_challenges) >= _CHALLENGE_MAX:
+                _challenges.pop(next(iter(_challenges)))  # oldest
+        _challenges[handle] = (now + _CHALLENGE_TTL, kind, challenge, email)
+        _latest_handle[kind] = handle
+    return handle
+
+
+def _pop_challenge(kind: str, handle: str | None) -> tuple[bytes, str | None] | None:
+    """Remove and return (challenge, email) for handle (or the newest of kind if no handle); None if missing/expired."""
+    with _challenges_lock:
+        if not handle:
+            handle = _latest_handle.get(kind)
+        entry = _challenges.pop(handle, None) if handle else None
+        if _latest_handle.get(kind) == handle:
+            _latest_handle.pop(kind, None)
+    if entry is None or entry[1] != kind or entry[0] <= time.monotonic():
+        return None
+    return entry[2], entry[3]
+
+
+def _get_allow_credentials():
+    """Return PublicKeyCredentialDescriptors for all stored credentials (None if there are none)."""
+    global _allow_creds_cache
+    with _creds_lock:
+        cached = _allow_creds_cache
+        version = _creds_version
+    if cached is not None and cached[1] == version:
+        return cached[0]
+    # Only the ids are needed: skip loading public keys and building ORM instances
+    cred_ids = db.session.execute(select(WebAuthnCredential.credential_id)).scalars().all()
+    allow_credentials = None
+    if cred_ids:
+        allow_credentials = [PublicKeyCredentialDescriptor(id=cred_id) for cred_id in cred_ids]
+    with _creds_lock:
+        if _creds_version == version:
+            _allow_creds_cache = (allow_credentials, version)
+    return allow_credentials
+
+
+def invalidate_allow_credentials():
+    """Force login_options to reload credentials (call after adding, removing or restoring credentials)."""
+    global _creds_version
+    with _creds_lock:
+        _creds_version += 1
+
+
+def _build_rp_resolver(config):
     """
-    Return (rp_id, origin) for the current request. Uses ENVIRONMENT and/or
-    request Origin to choose between LOCAL and PROD when both are configured.
+    Precompute the WebAuthn RP settings from config and return resolve(origin_header) -> (rp_id, origin).
+    Uses ENVIRONMENT and/or request Origin to choose between LOCAL and PROD when both are configured.
     """
-    env = current_app.config.get("ENVIRONMENT") or ""
-    origin_header = (request.headers.get("Origin") or "").strip()
-    rp_id_local = current_app.config.get("WEBAUTHN_RP_ID_LOCAL") or "localhost"
-    origin_local = current_app.config.get("WEBAUTHN_ORIGIN_LOCAL") or "http://localhost:5173"
-    rp_id_prod = (current_app.config.get("WEBAUTHN_RP_ID_PROD") or "").strip()
-    origin_prod = (current_app.config.get("WEBAUTHN_ORIGIN_PROD") or "").strip()
-    rp_id_fallback = current_app.config.get("WEBAUTHN_RP_ID") or "localhost"
-    origin_fallback = current_app.config.get("WEBAUTHN_ORIGIN") or "http://localhost:5173"
+    env = config.get("ENVIRONMENT") or ""
+    local = (
+        config.get("WEBAUTHN_RP_ID_LOCAL") or "localhost",
+        config.get("WEBAUTHN_ORIGIN_LOCAL") or "http://localhost:5173",
+    )
+    prod = (
+        (config.get("WEBAUTHN_RP_ID_PROD") or "").strip(),
+        (config.get("WEBAUTHN_ORIGIN_PROD") or "").strip(),
+    )
+    fallback = (
+        config.get("WEBAUTHN_RP_ID") or "localhost",
+        config.get("WEBAUTHN_ORIGIN") or "http://localhost:5173",
+    )
 
     if env == "local":
-        return (rp_id_local, origin_local)
-    if env == "prod" and rp_id_prod and origin_prod:
-        return (rp_id_prod, origin_prod)
+        return lambda origin_header: local
+    if env == "prod" and prod[0] and prod[1]:
+        return lambda origin_header: prod
 
     # ENVIRONMENT is "both" or unset: choose by request Origin so local and prod can work at once
-    if origin_header == origin_local:
-        return (rp_id_local, origin_local)
-    if origin_prod and origin_header == origin_prod:
-        return (rp_id_prod, origin_prod)
+    origin_local = local[1]
+    origin_prod = prod[1]
 
-    return (rp_id_fallback, origin_fallback)
+    def resolve(origin_header):
+        if origin_header == origin_local:
+            return local
+        if origin_prod and origin_header == origin_prod:
+            return prod
+        return fallback
+
+    return resolve
+
+
+@auth_blueprint.record_once
+def _init_rp_resolver(state):
+    state.app.extensions["webauthn_resolver"] = _build_rp_resolver(state.app.config)
+
+
+def _get_webauthn_rp_id_and_origin():
+    """Return (rp_id, origin) for the current request."""
+    resolver = current_app.extensions.get("webauthn_resolver")
+    if resolver is None:
+        resolver = current_app.extensions["webauthn_resolver"] = _build_rp_resolver(current_app.config)
+    return resolver((request.headers.get("Origin") or "").strip())
 
 
 def _get_webauthn_config():
@@ -127,12 +228,16 @@ def auth_config():
     return jsonify({"allow_new_users": allow_new_users})
 
 
+def _options_response(options, handle):
+    """Serialized WebAuthn options (options_to_json) plus the challenge handle, as one JSON object."""
+    return jsonify(json.loads(options_to_json(options)) | {"handle": handle})
+
+
 # ---- Registration ----
 
 @auth_blueprint.route("/register/options", methods=["GET"])
 def register_options():
     """Return PublicKeyCredentialCreationOptions for the client. Requires ?email= for allowed-users mode."""
-    global _registration_email
     if not current_app.config.get("ALLOW_NEW_USERS", True):
         return jsonify({"error": REGISTRATION_REFUSED_MESSAGE}), 403
     try:
@@ -143,13 +248,12 @@ def register_options():
         if allowed and email not in allowed:
             _log_registration_refused(email)
             return jsonify({"error": REGISTRATION_REFUSED_MESSAGE}), 403
-        user = _get_or_create_user_for_email(email) if email else _get_or_create_user_for_email("")
+        user = _get_or_create_user_for_email(email or "", allowed)
         user_id, user_name, user_display_name = user.to_webauthn_user()
         rp_id, _ = _get_webauthn_rp_id_and_origin()
         rp_name = current_app.config.get("WEBAUTHN_RP_NAME", "Garden of Eden")
         challenge = secrets.token_bytes(32)
-        _challenges["registration"] = challenge
-        _registration_email = email if allowed else None
+        handle = _store_challenge("registration", challenge, email if allowed else None)
         options = generate_registration_options(
             rp_id=rp_id,
             rp_name=rp_name,
@@ -157,12 +261,9 @@ def register_options():
             user_name=user_name,
             user_display_name=user_display_name,
             challenge=challenge,
-            authenticator_selection=AuthenticatorSelectionCriteria(
-                resident_key=ResidentKeyRequirement.PREFERRED,
-                user_verification=UserVerificationRequirement.PREFERRED,
-            ),
+            authenticator_selection=_AUTH_SELECTION,
         )
-        return jsonify(json.loads(options_to_json(options)))
+        return _options_response(options, handle)
     except ValueError as e:
         return jsonify({"error": str(e)}), 403
     except Exception as e:
@@ -173,24 +274,23 @@ def register_options():
 @auth_blueprint.route("/register", methods=["POST"])
 def register():
     """Verify registration response and store the credential. Body may include email for allowed-users mode."""
-    global _registration_email
     if not current_app.config.get("ALLOW_NEW_USERS", True):
         return jsonify({"error": REGISTRATION_REFUSED_MESSAGE}), 403
     try:
-        challenge = _challenges.pop("registration", None)
-        if not challenge:
-            return jsonify({"error": "No registration in progress or expired"}), 400
         body = request.get_json() or {}
+        pending = _pop_challenge("registration", body.get("handle"))
+        if not pending:
+            return jsonify({"error": "No registration in progress or expired"}), 400
+        challenge, registration_email = pending
         credential = body.get("credential")
         if not credential:
             return jsonify({"error": "Missing credential"}), 400
-        email = (body.get("email") or _registration_email or "").strip().lower()
-        _registration_email = None
+        email = (body.get("email") or registration_email or "").strip().lower()
         allowed = _get_allowed_emails()
         if allowed and email not in allowed:
             _log_registration_refused(email)
             return jsonify({"error": REGISTRATION_REFUSED_MESSAGE}), 403
-        user = _get_or_create_user_for_email(email) if email else _get_or_create_user_for_email("")
+        user = _get_or_create_user_for_email(email or "", allowed)
         rp_id, origin = _get_webauthn_rp_id_and_origin()
         verification = verify_registration_response(
             credential=credential,
@@ -207,6 +307,7 @@ def register():
         )
         db.session.add(cred)
         db.session.commit()
+        invalidate_allow_credentials()
         return jsonify({"ok": True, "message": "Passkey registered"})
     except Exception as e:
         _log.exception("register verify")
@@ -219,21 +320,17 @@ def register():
 def login_options():
     """Return PublicKeyCredentialRequestOptions."""
     try:
-        creds = WebAuthnCredential.query.all()
-        allow_credentials = None
-        if creds:
-            from webauthn.helpers.structs import PublicKeyCredentialDescriptor
-            allow_credentials = [PublicKeyCredentialDescriptor(id=c.credential_id) for c in creds]
+        allow_credentials = _get_allow_credentials()
         rp_id, _ = _get_webauthn_rp_id_and_origin()
         challenge = secrets.token_bytes(32)
-        _challenges["authentication"] = challenge
+        handle = _store_challenge("authentication", challenge)
         options = generate_authentication_options(
             rp_id=rp_id,
             challenge=challenge,
             allow_credentials=allow_credentials,
             user_verification=UserVerificationRequirement.PREFERRED,
         )
-        return jsonify(json.loads(options_to_json(options)))
+        return _options_response(options, handle)
     except Exception as e:
         _log.exception("login_options")
         return jsonify({"error": str(e)}), 500
@@ -243,10 +340,11 @@ def login_options():
 def login():
     """Verify authentication response and return a JWT."""
     try:
-        challenge = _challenges.pop("authentication", None)
-        if not challenge:
-            return jsonify({"error": "No login in progress or expired"}), 400
         body = request.get_json() or {}
+        pending = _pop_challenge("authentication", body.get("handle"))
+        if not pending:
+            return jsonify({"error": "No login in progress or expired"}), 400
+        challenge, _ = pending
         credential = body.get("credential")
         if not credential:
             return jsonify({"error": "Missing credential"}), 400
@@ -301,11 +399,7 @@ def me():
         return jsonify({"error": "Missing or invalid Authorization"}), 401
     token = auth[7:].strip()
     try:
-        payload = jwt.decode(
-            token,
-            current_app.config["SECRET_KEY"],
-            algorithms=[current_app.config["JWT_ALGORITHM"]],
-        )
+        payload = _verify_cached(token, current_app.config["SECRET_KEY"], current_app.config["JWT_ALGORITHM"])
         user_id = int(payload["sub"])
         user = User.query.get(user_id)
         if not user:
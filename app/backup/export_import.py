@@ -2,23 +2,18 @@
 Export SQLite tables + JSON file state to a snapshot dict.
 Import snapshot back to SQLite + files.
 """
-import base64
-import json
+import binascii
 import logging
 import os
 from datetime import datetime
-from pathlib import Path
 
 if False:
     from flask import Flask
 
 logger = logging.getLogger(__name__)
 
-
-def _serialize_dt(dt):
-    if dt is None:
-        return None
-    return dt.isoformat() + ("Z" if dt.tzinfo is None else "")
+# Rows fetched per round-trip when streaming the history tables
+_BATCH_SIZE = 500
 
 
 def _deserialize_dt(s):
@@ -32,89 +27,136 @@ def _deserialize_dt(s):
 def _bytes_to_b64(b):
     if b is None:
         return None
-    return base64.b64encode(b).decode("ascii")
+    return binascii.b2a_base64(b, newline=False).decode("ascii")
 
 
 def _b64_to_bytes(s):
     if s is None:
         return None
-    return base64.b64decode(s)
+    if isinstance(s, (bytes, bytearray)):
+        return bytes(s)  # already binary (e.g. BSON Binary read back from MongoDB)
+    return binascii.a2b_base64(s)
+
+
+def iter_sensor_readings(since=None):
+    """Yield sensor_readings rows (oldest first) as snapshot dicts, fetched in batches. Needs an app context."""
+    from sqlalchemy import select
+    from app.lib.sql_time import iso_utc
+    from app.models import db, SensorReading
+    # created_at is formatted by SQLite, already in the snapshot's ISO form
+    stmt = select(
+        SensorReading.id,
+        iso_utc(SensorReading.created_at),
+        SensorReading.water_level,
+        SensorReading.humidity,
+        SensorReading.air_temp,
+        SensorReading.pcb_temp,
+        SensorReading.light_percentage,
+    )
+    if since is not None:
+        stmt = stmt.where(SensorReading.created_at >= since)
+    stmt = stmt.order_by(SensorReading.id.asc()).execution_options(yield_per=_BATCH_SIZE)
+    for id_, created_at, water_level, humidity, air_temp, pcb_temp, light_percentage in db.session.execute(stmt):
+        yield {
+            "id": id_,
+            "created_at": created_at,
+            "water_level": water_level,
+            "humidity": humidity,
+            "air_temp": air_temp,
+            "pcb_temp": pcb_temp,
+            "light_percentage": light_percentage,
+        }
+
+
+def iter_pump_events(since=None):
+    """Yield pump_events rows (oldest first) as snapshot dicts, fetched in batches. Needs an app context."""
+    from sqlalchemy import select
+    from app.lib.sql_time import iso_utc
+    from app.models import db, PumpEvent
+    stmt = select(
+        PumpEvent.id,
+        iso_utc(PumpEvent.created_at),
+        PumpEvent.is_on,
+        PumpEvent.trigger,
+        PumpEvent.rule_id,
+    )
+    if since is not None:
+        stmt = stmt.where(PumpEvent.created_at >= since)
+    stmt = stmt.order_by(PumpEvent.id.asc()).execution_options(yield_per=_BATCH_SIZE)
+    for id_, created_at, is_on, trigger, rule_id in db.session.execute(stmt):
+        yield {
+            "id": id_,
+            "created_at": created_at,
+            "is_on": is_on,
+            "trigger": trigger,
+            "rule_id": rule_id,
+        }
+
+
+def select_users(conn=None):
+    """
+    Return users as snapshot dicts, read as plain rows (no ORM instances).
+    Runs on conn if given (e.g. a worker thread's engine connection), else on db.session in the current app context.
+    """
+    from sqlalchemy import select
+    from app.models import db, User
+    stmt = select(User.id, User.name, User.display_name, User.email)
+    return [dict(r._mapping) for r in (conn if conn is not None else db.session).execute(stmt)]
+
+
+def select_webauthn_credentials(conn=None):
+    """Return WebAuthn credentials as snapshot dicts (bytes -> b64), read as plain rows. conn as for select_users."""
+    from sqlalchemy import select
+    from app.models import db, WebAuthnCredential
+    stmt = select(
+        WebAuthnCredential.id,
+        WebAuthnCredential.user_id,
+        WebAuthnCredential.credential_id,
+        WebAuthnCredential.public_key,
+        WebAuthnCredential.sign_count,
+    )
+    return [
+        {
+            "id": c.id,
+            "user_id": c.user_id,
+            "credential_id": _bytes_to_b64(c.credential_id),
+            "public_key": _bytes_to_b64(c.public_key),
+            "sign_count": c.sign_count,
+        }
+        for c in (conn if conn is not None else db.session).execute(stmt)
+    ]
 
 
 def export_snapshot(app: "Flask") -> dict:
     """Export all backupable data from SQLite and JSON files. Returns JSON-serializable dict."""
     with app.app_context():
-        from app.models import (
-            db,
-            User,
-            WebAuthnCredential,
-            AppSettings,
-            SensorReading,
-            PumpEvent,
-        )
+        snapshot = export_small_tables(app)
+        snapshot["data"]["sensor_readings"] = list(iter_sensor_readings())
+        snapshot["data"]["pump_events"] = list(iter_pump_events())
+        return snapshot
+
+
+def export_small_tables(app: "Flask") -> dict:
+    """
+    Like export_snapshot but without sensor_readings and pump_events (never queried), for callers
+    that handle the history tables separately.
+    """
+    with app.app_context():
+        from app.models import AppSettings
         from app.schedules.store import load_rules
         from app.plant_of_the_day import store as plant_store
-        from app.alerts.alert_state import _load as alert_load, _save as alert_save
+        from app.alerts.alert_state import snapshot_state as alert_load
 
         data = {}
 
-        # Users
-        users = User.query.all()
-        data["users"] = [
-            {
-                "id": u.id,
-                "name": u.name,
-                "display_name": u.display_name,
-                "email": u.email,
-            }
-            for u in users
-        ]
-
-        # WebAuthn credentials (bytes -> b64)
-        creds = WebAuthnCredential.query.all()
-        data["webauthn_credentials"] = [
-            {
-                "id": c.id,
-                "user_id": c.user_id,
-                "credential_id": _bytes_to_b64(c.credential_id),
-                "public_key": _bytes_to_b64(c.public_key),
-                "sign_count": c.sign_count,
-            }
-            for c in creds
-        ]
+        # Users and WebAuthn credentials (bytes -> b64)
+        data["users"] = select_users()
+        data["webauthn_credentials"] = select_webauthn_credentials()
 
         # App settings (single row id=1)
         row = AppSettings.query.get(1)
         data["app_settings"] = [row.to_dict()] if row else []
 
-        # Sensor readings
-        readings = SensorReading.query.order_by(SensorReading.id.asc()).all()
-        data["sensor_readings"] = [
-            {
-                "id": r.id,
-                "created_at": _serialize_dt(r.created_at),
-                "water_level": r.water_level,
-                "humidity": r.humidity,
-                "air_temp": r.air_temp,
-                "pcb_temp": r.pcb_temp,
-                "light_percentage": r.light_percentage,
-            }
-            for r in readings
-        ]
-
-        # Pump events
-        events = PumpEvent.query.order_by(PumpEvent.id.asc()).all()
-        data["pump_events"] = [
-            {
-                "id": e.id,
-                "created_at": _serialize_dt(e.created_at),
-                "is_on": e.is_on,
-                "trigger": e.trigger,
-                "rule_id": e.rule_id,
-            }
-            for e in events
-        ]
-
         files = {}
 
         # Schedule rules (JSON file)
@@ -163,36 +205,34 @@ def import_snapshot(app: "Flask", snapshot: dict) -> None:
         data = snapshot.get("data", {})
         files = snapshot.get("files", {})
 
-        # Clear and re-insert in dependency order
+        # Clear and re-insert in dependency order, all in one transaction (one commit, one journal sync)
         PumpEvent.query.delete()
         SensorReading.query.delete()
         WebAuthnCredential.query.delete()
         User.query.delete()
         AppSettings.query.delete()
-        db.session.commit()
 
-        # Users
-        for row in data.get("users", []):
-            u = User(
-                id=row["id"],
-                name=row["name"],
-                display_name=row.get("display_name", ""),
-                email=row.get("email"),
-            )
-            db.session.add(u)
-        db.session.commit()
+        # Bulk inserts skip the unit-of-work per row; values are decoded once into plain mappings
+        db.session.bulk_insert_mappings(User, [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "display_name": row.get("display_name", ""),
+                "email": row.get("email"),
+            }
+            for row in data.get("users", [])
+        ])
 
-        # WebAuthn credentials
-        for row in data.get("webauthn_credentials", []):
-            c = WebAuthnCredential(
-                id=row["id"],
-                user_id=row["user_id"],
-                credential_id=_b64_to_bytes(row["credential_id"]),
-                public_key=_b64_to_bytes(row["public_key"]),
-                sign_count=row.get("sign_count", 0),
-            )
-            db.session.add(c)
-        db.session.commit()
+        db.session.bulk_insert_mappings(WebAuthnCredential, [
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "credential_id": _b64_to_bytes(row["credential_id"]),
+                "public_key": _b64_to_bytes(row["public_key"]),
+                "sign_count": row.get("sign_count", 0),
+            }
+            for row in data.get("webauthn_credentials", [])
+        ])
 
         # App settings (id=1)
         for row in data.get("app_settings", []):
@@ -201,34 +241,37 @@ def import_snapshot(app: "Flask", snapshot: dict) -> None:
             kwargs["id"] = 1
             s = AppSettings(**kwargs)
             db.session.add(s)
-        db.session.commit()
 
-        # Sensor readings
-        for row in data.get("sensor_readings", []):
-            r = SensorReading(
-                id=row["id"],
-                created_at=_deserialize_dt(row["created_at"]),
-                water_level=row.get("water_level"),
-                humidity=row.get("humidity"),
-                air_temp=row.get("air_temp"),
-                pcb_temp=row.get("pcb_temp"),
-                light_percentage=row.get("light_percentage"),
-            )
-            db.session.add(r)
-        db.session.commit()
+        db.session.bulk_insert_mappings(SensorReading, [
+            {
+                "id": row["id"],
+                "created_at": _deserialize_dt(row["created_at"]),
+                "water_level": row.get("water_level"),
+                "humidity": row.get("humidity"),
+                "air_temp": row.get("air_temp"),
+                "pcb_temp": row.get("pcb_temp"),
+                "light_percentage": row.get("light_percentage"),
+            }
+            for row in data.get("sensor_readings", [])
+        ])
 
-        # Pump events
-        for row in data.get("pump_events", []):
-            e = PumpEvent(
-                id=row["id"],
-                created_at=_deserialize_dt(row["created_at"]),
-                is_on=row["is_on"],
-                trigger=row["trigger"],
-                rule_id=row.get("rule_id"),
-            )
-            db.session.add(e)
+        db.session.bulk_insert_mappings(PumpEvent, [
+            {
+                "id": row["id"],
+                "created_at": _deserialize_dt(row["created_at"]),
+                "is_on": row["is_on"],
+                "trigger": row["trigger"],
+                "rule_id": row.get("rule_id"),
+            }
+            for row in data.get("pump_events", [])
+        ])
         db.session.commit()
 
+        from app.auth.routes import invalidate_allow_credentials
+        from app.alerts.slack import invalidate_settings_cache
+        invalidate_allow_credentials()
+        invalidate_settings_cache()
+
         # Schedule rules file
         if "schedule_rules" in files:
             try:
@@ -244,10 +287,7 @@ def import_snapshot(app: "Flask", snapshot: dict) -> None:
                 logger.warning("Restore plant_of_the_day_current: %s", e)
         if "plant_of_the_day_used_ids" in files:
             try:
-                path = Path(app.instance_path) / plant_store.USED_IDS_FILENAME
-                path.parent.mkdir(parents=True, exist_ok=True)
-                with open(path, "w") as f:
-                    json.dump(files["plant_of_the_day_used_ids"], f)
+                plant_store.set_used_ids(app, (files["plant_of_the_day_used_ids"] or {}).get("ids") or [])
             except Exception as e:
                 logger.warning("Restore plant_of_the_day_used_ids: %s", e)
 
@@ -258,14 +298,21 @@ def import_snapshot(app: "Flask", snapshot: dict) -> None:
             except Exception as e:
                 logger.warning("Restore alert_state: %s", e)
 
-        # Reset SQLite sequences so new rows get ids after restored max id
+        # Reset SQLite sequences so new rows get ids after restored max id (one query, one commit)
         from sqlalchemy import text
-        for table, col in [("users", "id"), ("webauthn_credentials", "id"), ("sensor_readings", "id"), ("pump_events", "id")]:
-            try:
-                r = db.session.execute(text(f"SELECT COALESCE(MAX({col}), 0) FROM {table}"))
-                max_id = r.scalar() or 0
-                db.session.execute(text(f"DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table})
-                db.session.execute(text(f"INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": table, "seq": max_id})
-                db.session.commit()
-            except Exception as e:
-                logger.warning("Reset sequence for %s: %s", table, e)
+        tables = ("users", "webauthn_credentials", "sensor_readings", "pump_events")
+        try:
+            max_ids = db.session.execute(text(
+                " UNION ALL ".join(f"SELECT '{t}', COALESCE(MAX(id), 0) FROM {t}" for t in tables)
+            )).all()
+            db.session.execute(
+                text("DELETE FROM sqlite_sequence WHERE name IN ('" + "', '".join(tables) + "')")
+            )
+            db.session.execute(
+                text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                [{"name": name, "seq": max_id or 0} for name, max_id in max_ids],
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("Reset sqlite sequences: %s", e)
@@ -1,9 +1,20 @@
 """
 MongoDB connection and backup document access.
 Uses MONGODB_URL env (database name is in the URL; we use collection 'backup').
+
+sensor_readings and pump_events are stored as a list of compressed chunks under "history"
+(one per full backup or incremental run) with the newest ids in "last_ids", so they stay well
+under the 16 MB document limit and incremental runs can $push a chunk. get_backup_doc() returns
+them as plain data.sensor_readings / data.pump_events lists either way (older documents stored
+them as plain arrays).
 """
 import logging
 import os
+import zlib
+from threading import Lock
+from time import monotonic
+
+from app.lib import json_codec
 
 logger = logging.getLogger(__name__)
 
@@ -11,56 +22,223 @@ COLLECTION_NAME = "backup"
 DOC_ID = "latest"
 
 _client = None
+_collection = None
+
+# After a failed connect, calls fail fast with the same error for this long instead of each
+# blocking on the 5s server selection timeout (e.g. /backup/status polled while MongoDB is down)
+_RETRY_AFTER_SECONDS = 30
+_last_failure = None  # (monotonic time, exception)
+_connect_lock = Lock()
+
+# get_backup_meta result, reused for _META_TTL seconds: (expires at, doc or None). The backup
+# document only changes on a manual/daily backup in this process, and those writes clear it.
+_META_TTL = 60  # seconds
+_meta_cache = None
+
+
+_HISTORY_TABLES = ("sensor_readings", "pump_events")
+
+
+def _pack_history(tables: dict) -> dict:
+    """
+    Compress {table: rows} into one history chunk. Always zlib (stdlib), so any host can restore
+    the backup; zstandard isn't a requirement.
+    """
+    from bson import Binary
+    return {"encoding": "zlib+json", "blob": Binary(zlib.compress(json_codec.dumps(tables), 6))}
+
+
+def _unpack_history(chunk: dict) -> dict:
+    """Decompress a history chunk. zstd chunks (written by earlier versions) need zstandard installed."""
+    encoding = chunk.get("encoding")
+    blob = bytes(chunk["blob"])
+    if encoding == "zlib+json":
+        return json_codec.loads(zlib.decompress(blob))
+    if encoding == "zstd+json":
+        import zstandard
+        return json_codec.loads(zstandard.ZstdDecompressor().decompress(blob))
+    raise ValueError(f"Unknown backup history encoding: {encoding!r}")
+
+
+def _compressors():
+    """Wire compressors to offer the server: zstd/snappy when their packages are installed, zlib always."""
+    names = []
+    for name, module in (("zstd", "zstandard"), ("snappy", "snappy")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        names.append(name)
+    names.append("zlib")
+    return ",".join(names)
 
 
 def get_client():
-    """Return pymongo MongoClient. Raises if MONGODB_URL not set or invalid."""
-    global _client
+    """
+    Return pymongo MongoClient (created and pinged once per process, then reused).
+    Raises if MONGODB_URL not set or invalid, or (without retrying) if a connect failed in the last _RETRY_AFTER_SECONDS.
+    """
+    global _client, _last_failure
     if _client is not None:
         return _client
     url = (os.environ.get("MONGODB_URL") or "").strip()
     if not url:
         raise ValueError("MONGODB_URL is not set")
-    try:
-        from pymongo import MongoClient
-        _client = MongoClient(url, serverSelectionTimeoutMS=5000)
-        _client.admin.command("ping")
-        return _client
-    except Exception as e:
-        logger.warning("MongoDB connection failed: %s", e)
-        raise
+    with _connect_lock:
+        if _client is not None:
+            return _client
+        if _last_failure is not None and monotonic() - _last_failure[0] < _RETRY_AFTER_SECONDS:
+            raise _last_failure[1]
+        client = None
+        try:
+            from pymongo import MongoClient
+            # Snapshots are several MB of repetitive JSON-like data, so compress on the wire.
+            # Backups run from one scheduler thread or an admin request: a small pool is plenty.
+            client = MongoClient(
+                url,
+                serverSelectionTimeoutMS=5000,
+                compressors=_compressors(),
+                maxPoolSize=10,
+                minPoolSize=1,
+                retryWrites=True,
+            )
+            client.admin.command("ping")
+            _client = client
+            _last_failure = None
+            return _client
+        except Exception as e:
+            logger.warning("MongoDB connection failed: %s", e)
+            if client is not None:
+                client.close()  # stop its monitor threads; a fresh client is built on retry
+            _last_failure = (monotonic(), e)
+            raise
 
 
 def get_collection():
     """Return the backup collection (database is inferred from MONGODB_URL)."""
-    client = get_client()
-    # Default database from URL (e.g. mongodb://host/dbname -> dbname)
-    db = client.get_database()
-    return db[COLLECTION_NAME]
+    global _collection
+    if _collection is None:
+        # Default database from URL (e.g. mongodb://host/dbname -> dbname)
+        _collection = get_client().get_database()[COLLECTION_NAME]
+    return _collection
 
 
 def get_backup_doc():
-    """Return the current backup document or None."""
+    """Return the current backup document (history chunks expanded into data) or None."""
     try:
         coll = get_collection()
-        return coll.find_one({"_id": DOC_ID})
+        doc = coll.find_one({"_id": DOC_ID})
     except Exception as e:
         logger.warning("Could not read backup document: %s", e)
         return None
+    if doc and "data" in doc:
+        data = doc["data"]
+        for table in _HISTORY_TABLES:
+            data.setdefault(table, [])
+        for chunk in doc.pop("history", None) or ():
+            for table, rows in _unpack_history(chunk).items():
+                data[table].extend(rows)
+    return doc
+
+
+def get_backup_meta():
+    """
+    Return only created_at / last_incremental_at of the backup document, or None if there is no backup.
+    Cached for _META_TTL seconds; failed reads are not cached.
+    """
+    global _meta_cache
+    cached = _meta_cache
+    now = monotonic()
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    try:
+        coll = get_collection()
+        doc = coll.find_one({"_id": DOC_ID}, {"created_at": 1, "last_incremental_at": 1})
+    except Exception as e:
+        logger.warning("Could not read backup document: %s", e)
+        return None
+    _meta_cache = (now + _META_TTL, doc)
+    return doc
+
+
+def invalidate_backup_meta():
+    """Drop the cached get_backup_meta result (done by every write to the backup document)."""
+    global _meta_cache
+    _meta_cache = None
+
+
+def get_backup_head():
+    """
+    Return {created_at, last_incremental_at, last_sensor_reading_id, last_pump_event_id} for the backup
+    document without reading its history, or None if there is no backup.
+    """
+    try:
+        coll = get_collection()
+        doc = coll.find_one(
+            {"_id": DOC_ID},
+            {
+                "created_at": 1,
+                "last_incremental_at": 1,
+                "last_ids": 1,
+                # Older documents keep history as plain arrays: fetch only their last element
+                "data.sensor_readings": {"$slice": -1},
+                "data.pump_events": {"$slice": -1},
+            },
+        )
+    except Exception as e:
+        logger.warning("Could not read backup document: %s", e)
+        return None
+    if not doc:
+        return None
+    head = {"created_at": doc.get("created_at"), "last_incremental_at": doc.get("last_incremental_at")}
+    last_ids = doc.get("last_ids") or {}
+    data = doc.get("data") or {}
+    for table, key in zip(_HISTORY_TABLES, ("last_sensor_reading_id", "last_pump_event_id")):
+        last_id = last_ids.get(table)
+        if last_id is None:
+            rows = data.get(table) or [{}]
+            last_id = rows[-1].get("id")
+        head[key] = last_id or 0
+    return head
 
 
 def put_backup_doc(snapshot: dict, created_at: str, last_incremental_at: str | None = None):
     """Replace the backup document with the given snapshot."""
     coll = get_collection()
+    data = dict(snapshot.get("data", {}))
+    history = {table: data.pop(table, []) for table in _HISTORY_TABLES}
     doc = {
         "_id": DOC_ID,
         "created_at": created_at,
-        "data": snapshot.get("data", {}),
+        "data": data,
         "files": snapshot.get("files", {}),
+        "history": [_pack_history(history)] if any(history.values()) else [],
+        "last_ids": {table: max(r["id"] for r in rows) for table, rows in history.items() if rows},
     }
     if last_incremental_at is not None:
         doc["last_incremental_at"] = last_incremental_at
     coll.replace_one({"_id": DOC_ID}, doc, upsert=True)
+    invalidate_backup_meta()
+
+
+def append_backup_doc(snapshot: dict, new_readings: list, new_events: list, last_incremental_at: str):
+    """
+    Update the backup document in place: push one history chunk with the new sensor_readings/pump_events
+    and overwrite the small tables and files from snapshot (exported without history), in one update_one.
+    """
+    coll = get_collection()
+    to_set = {f"data.{table}": rows for table, rows in snapshot.get("data", {}).items()}
+    to_set["files"] = snapshot.get("files", {})
+    to_set["last_incremental_at"] = last_incremental_at
+    update = {"$set": to_set}
+    history = {"sensor_readings": new_readings, "pump_events": new_events}
+    if new_readings or new_events:
+        update["$push"] = {"history": _pack_history(history)}
+        for table, rows in history.items():
+            if rows:
+                to_set[f"last_ids.{table}"] = max(r["id"] for r in rows)
+    coll.update_one({"_id": DOC_ID}, update, upsert=False)
+    invalidate_backup_meta()
 
 
 def update_backup_meta(last_incremental_at: str):
@@ -71,3 +249,4 @@ def update_backup_meta(last_incremental_at: str):
         {"$set": {"last_incremental_at": last_incremental_at}},
         upsert=False,
     )
+    invalidate_backup_meta()
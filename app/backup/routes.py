@@ -10,7 +10,7 @@ from datetime import datetime, timezone
 from flask import Blueprint, jsonify, current_app
 
 from app.backup.export_import import export_snapshot, import_snapshot
-from app.backup.mongodb import get_backup_doc, put_backup_doc, get_client
+from app.backup.mongodb import get_backup_doc, get_backup_meta, put_backup_doc, get_client
 from app.backup.audit import audit_snapshot
 
 logger = logging.getLogger(__name__)
@@ -72,7 +72,7 @@ def restore_backup():
 def backup_status():
     """Return last backup time and whether MongoDB is reachable."""
     try:
-        doc = get_backup_doc()
+        doc = get_backup_meta()
         if not doc:
             return jsonify({"available": False, "message": "No backup in MongoDB."})
         return jsonify({
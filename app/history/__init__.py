@@ -1,4 +1,4 @@
 # Historical sensor readings and pump events
-from .record import log_pump_event, record_sensor_snapshot
+from .record import log_pump_event, log_pump_events, record_sensor_snapshot
 
-__all__ = ["log_pump_event", "record_sensor_snapshot"]
+__all__ = ["log_pump_event", "log_pump_events", "record_sensor_snapshot"]
@@ -2,6 +2,7 @@
 Record sensor snapshots (for 5-min polling) and pump on/off events.
 Uses lazy imports to avoid circular imports and early hardware init.
 """
+import importlib
 import logging
 from typing import TYPE_CHECKING
 
@@ -10,6 +11,28 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# (SensorReading field, module, attribute, method to call on it or None if the attribute is the function)
+_SENSOR_SOURCES = (
+    ("water_level", "app.sensors.distance.routes", "distance_control", "measure_once"),
+    ("humidity", "app.sensors.humidity.routes", "humidity_sensor", "read"),
+    ("air_temp", "app.sensors.temperature.routes", "temperature_sensor", "read"),
+    ("pcb_temp", "app.sensors.pcb_temp.pcb_temp", "get_pcb_temperature", None),
+    ("light_percentage", "app.sensors.light.routes", "light_control", "get_brightness"),
+)
+
+# Field -> resolved read function. Filled on first successful import; a sensor whose import
+# or lookup fails isn't cached, so it is retried on the next snapshot.
+_readers = {}
+
+
+def _reader(field, module, attr, method):
+    fn = _readers.get(field)
+    if fn is None:
+        obj = getattr(importlib.import_module(module), attr)
+        fn = getattr(obj, method) if method else obj
+        _readers[field] = fn
+    return fn
+
 
 def record_sensor_snapshot(app: "Flask") -> None:
     """
@@ -19,50 +42,15 @@ def record_sensor_snapshot(app: "Flask") -> None:
     with app.app_context():
         from app.models import SensorReading, db
 
-        water_level = None
-        humidity = None
-        air_temp = None
-        pcb_temp = None
-        light_percentage = None
-
-        try:
-            from app.sensors.distance.routes import distance_control
-            water_level = float(distance_control.measure_once())
-        except Exception as e:
-            logger.debug("History: skip water_level: %s", e)
-
-        try:
-            from app.sensors.humidity.routes import humidity_sensor
-            humidity = float(humidity_sensor.read())
-        except Exception as e:
-            logger.debug("History: skip humidity: %s", e)
+        values = {}
+        for field, module, attr, method in _SENSOR_SOURCES:
+            try:
+                values[field] = float(_reader(field, module, attr, method)())
+            except Exception as e:
+                logger.debug("History: skip %s: %s", field, e)
 
         try:
-            from app.sensors.temperature.routes import temperature_sensor
-            air_temp = float(temperature_sensor.read())
-        except Exception as e:
-            logger.debug("History: skip air_temp: %s", e)
-
-        try:
-            from app.sensors.pcb_temp.pcb_temp import get_pcb_temperature
-            pcb_temp = float(get_pcb_temperature())
-        except Exception as e:
-            logger.debug("History: skip pcb_temp: %s", e)
-
-        try:
-            from app.sensors.light.routes import light_control
-            light_percentage = float(light_control.get_brightness())
-        except Exception as e:
-            logger.debug("History: skip light_percentage: %s", e)
-
-        try:
-            row = SensorReading(
-                water_level=water_level,
-                humidity=humidity,
-                air_temp=air_temp,
-                pcb_temp=pcb_temp,
-                light_percentage=light_percentage,
-            )
+            row = SensorReading(**values)
             db.session.add(row)
             db.session.commit()
         except Exception as e:
@@ -74,12 +62,26 @@ def log_pump_event(app: "Flask", is_on: bool, trigger: str, rule_id: str | None
     """
     Append one row to pump_events. trigger must be "manual" or "rule".
     """
-    if trigger not in ("manual", "rule"):
-        trigger = "manual"
+    log_pump_events(app, [(is_on, trigger, rule_id)])
+
+
+def log_pump_events(app: "Flask", events: list[tuple[bool, str, str | None]]) -> None:
+    """
+    Append several (is_on, trigger, rule_id) rows to pump_events with one executemany INSERT and commit
+    (e.g. every rule that fired in the same scheduler tick). Same trigger rules as log_pump_event.
+    """
+    if not events:
+        return
+    rows = []
+    for is_on, trigger, rule_id in events:
+        if trigger not in ("manual", "rule"):
+            trigger = "manual"
+        rows.append({"is_on": is_on, "trigger": trigger, "rule_id": rule_id if trigger == "rule" else None})
     with app.app_context():
+        from sqlalchemy import insert
         from app.models import PumpEvent, db
         try:
-            db.session.add(PumpEvent(is_on=is_on, trigger=trigger, rule_id=rule_id if trigger == "rule" else None))
+            db.session.execute(insert(PumpEvent), rows)
             db.session.commit()
         except Exception as e:
             logger.warning("History: failed to log pump event: %s", e)
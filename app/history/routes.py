@@ -3,14 +3,23 @@ API for historical sensor readings and pump events.
 """
 from datetime import datetime, timedelta, timezone
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, stream_with_context
+from sqlalchemy import func, select
 
+from app.lib import json_codec
+from app.lib.sql_time import bucket_utc, iso_utc
 from app.models import SensorReading, PumpEvent, db
 
 history_blueprint = Blueprint("history", __name__)
 
 ALLOWED_METRICS = {"water_level", "humidity", "air_temp", "pcb_temp", "light_percentage"}
 RANGE_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+# Wide ranges are averaged into buckets of this many seconds (~2.9k points for month, ~8.8k for year);
+# day and week return the raw 5-minute readings
+BUCKET_SECONDS = {"month": 15 * 60, "year": 60 * 60}
+
+# Rows fetched per round-trip and encoded per response chunk
+_BATCH_SIZE = 1000
 
 
 def _parse_range() -> tuple[datetime, datetime] | None:
@@ -23,11 +32,44 @@ def _parse_range() -> tuple[datetime, datetime] | None:
     return (start, now)
 
 
+def _stream_json_list(key: str, items):
+    """
+    Respond with {key: [...]} encoded incrementally, so a year of rows is never held in memory
+    as a list. Items are written in chunks of _BATCH_SIZE. With ?format=ndjson the items are
+    sent as newline-delimited JSON (one object per line, no wrapper) instead.
+    """
+    if (request.args.get("format") or "").strip().lower() == "ndjson":
+        head, sep, tail, mimetype = b"", b"\n", b"\n", "application/x-ndjson"
+    else:
+        head, sep, tail, mimetype = b'{"' + key.encode() + b'":[', b",", b"]}", "application/json"
+
+    def generate():
+        yield head
+        lead = b""
+        batch = []
+        for item in items:
+            batch.append(json_codec.dumps(item))
+            if len(batch) >= _BATCH_SIZE:
+                yield lead + sep.join(batch)
+                lead = sep
+                batch = []
+        if batch:
+            yield lead + sep.join(batch)
+            lead = sep
+        # NDJSON ends each line with a newline, so an empty result is an empty body
+        if lead or head:
+            yield tail
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
+
+
 @history_blueprint.route("/readings", methods=["GET"])
 def get_readings():
     """
-    GET /history/readings?metrics=water_level,humidity,air_temp,pcb_temp,light_percentage&range=day|week|month|year
-    Returns { data: [ { created_at: "ISO8601", water_level?, humidity?, ... }, ... ] } in ascending time.
+    GET /history/readings?metrics=water_level,humidity,air_temp,pcb_temp,light_percentage&range=day|week|month|year[&format=ndjson]
+    Returns { data: [ { created_at: "ISO8601", water_level?, humidity?, ... }, ... ] } in ascending time
+    (with format=ndjson, one point object per line). For month and year each point is the average over a
+    BUCKET_SECONDS bucket, with created_at at the bucket start.
     """
     range_pair = _parse_range()
     if range_pair is None:
@@ -47,30 +89,39 @@ def get_readings():
     start_naive = start.replace(tzinfo=None) if start.tzinfo else start
     end_naive = end.replace(tzinfo=None) if end.tzinfo else end
 
-    rows = (
-        db.session.query(SensorReading)
-        .filter(SensorReading.created_at >= start_naive, SensorReading.created_at <= end_naive)
-        .order_by(SensorReading.created_at.asc())
-        .all()
-    )
-
-    data = []
-    for r in rows:
-        point = {"created_at": r.created_at.isoformat() + "Z"}
-        for m in metrics:
-            val = getattr(r, m, None)
-            if val is not None:
-                point[m] = round(float(val), 2)
-        data.append(point)
-
-    return jsonify({"data": data})
+    # Select only the requested metrics, rounded (and for wide ranges averaged per bucket) by SQLite,
+    # as plain row tuples
+    metrics = list(dict.fromkeys(metrics))
+    bucket_seconds = BUCKET_SECONDS.get((request.args.get("range") or "").strip().lower())
+    if bucket_seconds:
+        bucket = bucket_utc(SensorReading.created_at, bucket_seconds)
+        stmt = (
+            select(bucket, *(func.round(func.avg(getattr(SensorReading, m)), 2).label(m) for m in metrics))
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+    else:
+        stmt = select(
+            iso_utc(SensorReading.created_at), *(func.round(getattr(SensorReading, m), 2).label(m) for m in metrics)
+        ).order_by(SensorReading.created_at.asc())
+    stmt = stmt.where(
+        SensorReading.created_at >= start_naive, SensorReading.created_at <= end_naive
+    ).execution_options(yield_per=_BATCH_SIZE)
+
+    def points():
+        for created_at, *values in db.session.execute(stmt):
+            point = {"created_at": created_at}
+            point.update((m, v) for m, v in zip(metrics, values) if v is not None)
+            yield point
+
+    return _stream_json_list("data", points())
 
 
 @history_blueprint.route("/pump-events", methods=["GET"])
 def get_pump_events():
     """
-    GET /history/pump-events?range=day|week|month|year
-    Returns { events: [ { created_at, is_on, trigger, rule_id? }, ... ] } ascending.
+    GET /history/pump-events?range=day|week|month|year[&format=ndjson]
+    Returns { events: [ { created_at, is_on, trigger, rule_id? }, ... ] } ascending (with format=ndjson, one event per line).
     """
     range_pair = _parse_range()
     if range_pair is None:
@@ -80,20 +131,12 @@ def get_pump_events():
     start_naive = start.replace(tzinfo=None) if start.tzinfo else start
     end_naive = end.replace(tzinfo=None) if end.tzinfo else end
 
-    rows = (
-        db.session.query(PumpEvent)
-        .filter(PumpEvent.created_at >= start_naive, PumpEvent.created_at <= end_naive)
+    stmt = (
+        select(iso_utc(PumpEvent.created_at), PumpEvent.is_on, PumpEvent.trigger, PumpEvent.rule_id)
+        .where(PumpEvent.created_at >= start_naive, PumpEvent.created_at <= end_naive)
         .order_by(PumpEvent.created_at.asc())
-        .all()
+        .execution_options(yield_per=_BATCH_SIZE)
     )
 
-    events = [
-        {
-            "created_at": r.created_at.isoformat() + "Z",
-            "is_on": r.is_on,
-            "trigger": r.trigger,
-            "rule_id": r.rule_id,
-        }
-        for r in rows
-    ]
-    return jsonify({"events": events})
+    events = (dict(r._mapping) for r in db.session.execute(stmt))
+    return _stream_json_list("events", events)
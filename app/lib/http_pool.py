@@ -0,0 +1,82 @@
+"""
+Kept-alive HTTP(S) connections shared by outgoing API calls (Slack webhook, Perenual, Wikipedia).
+One connection per (scheme, host), so repeat calls to a host skip the TCP + TLS handshake.
+"""
+import http.client
+from threading import Lock
+from urllib.parse import urlsplit
+
+# (scheme, netloc) -> [Lock, connection or None]; the per-host lock serializes use of its connection
+_hosts_lock = Lock()
+_hosts = {}
+
+# Sent unless the caller passes its own; some APIs (e.g. Wikipedia) reject requests without one
+_USER_AGENT = "garden-of-eden"
+
+# Errors that mean a kept-alive connection was closed by the server; safe to retry once on a new one
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+def _host_entry(scheme, netloc):
+    with _hosts_lock:
+        entry = _hosts.get((scheme, netloc))
+        if entry is None:
+            entry = _hosts[(scheme, netloc)] = [Lock(), None]
+        return entry
+
+
+def _connection(entry, scheme, netloc, timeout):
+    conn = entry[1]
+    if conn is None:
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = entry[1] = cls(netloc, timeout=timeout)
+    else:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+    return conn
+
+
+def _drop(entry):
+    conn, entry[1] = entry[1], None
+    if conn is not None:
+        conn.close()
+
+
+def request(method, url, body=None, headers=None, timeout=10):
+    """
+    Send one request over the kept-alive connection to url's host and read the whole response.
+    Returns (status, reason, body bytes). Raises ValueError for a malformed URL, OSError or
+    http.client.HTTPException on network failure.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise ValueError(f"Invalid URL: {url}")
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    headers = dict(headers or {})
+    headers.setdefault("User-Agent", _USER_AGENT)
+    entry = _host_entry(parts.scheme, parts.netloc)
+    with entry[0]:
+        for attempt in range(2):
+            conn = _connection(entry, parts.scheme, parts.netloc, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()  # drain so the connection can be reused
+                if resp.will_close:
+                    _drop(entry)
+                return resp.status, resp.reason, data
+            except _STALE_CONNECTION_ERRORS:
+                _drop(entry)
+                if attempt:
+                    raise
+            except Exception:
+                _drop(entry)
+                raise
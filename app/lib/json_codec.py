@@ -0,0 +1,18 @@
+"""
+Compact JSON encode/decode. Uses orjson when it is installed, else the stdlib json module.
+dumps() always returns UTF-8 bytes; loads() accepts bytes or str.
+"""
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+except ImportError:
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    loads = json.loads
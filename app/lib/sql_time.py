@@ -0,0 +1,24 @@
+"""
+Format naive-UTC DateTime columns as ISO 8601 strings inside SQLite.
+"""
+from sqlalchemy import Integer, String, cast, func
+
+
+def iso_utc(column):
+    """
+    SQL expression equal to column.isoformat() + "Z" for a naive-UTC DateTime column.
+    SQLAlchemy stores these as 'YYYY-MM-DD HH:MM:SS.ffffff'; isoformat() uses a 'T' separator
+    and drops the fraction when it is zero. Labeled with the column's name.
+    """
+    text = func.replace(func.replace(column, " ", "T", type_=String), ".000000", "", type_=String)
+    return (text + "Z").label(column.key)
+
+
+def bucket_utc(column, seconds: int):
+    """
+    SQL expression for the start of the seconds-wide UTC bucket a naive-UTC DateTime column falls in,
+    as 'YYYY-MM-DDTHH:MM:SSZ' (same form as iso_utc for whole seconds). Labeled with the column's name.
+    """
+    epoch = cast(func.strftime("%s", column), Integer)
+    start = epoch // seconds * seconds
+    return func.strftime("%Y-%m-%dT%H:%M:%SZ", start, "unixepoch", type_=String).label(column.key)
@@ -1,5 +1,6 @@
 """
-SQLite models for passkey auth: User and WebAuthnCredential.
+SQLite models: passkey auth (User, WebAuthnCredential), AppSettings, and history (SensorReading, PumpEvent).
+The one SQLAlchemy instance (db) and all model classes live here; import them from app.models.
 """
 from __future__ import annotations
 
@@ -103,7 +104,8 @@ class SensorReading(db.Model):
     __tablename__ = "sensor_readings"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    created_at: Mapped[datetime] = mapped_column(nullable=False, default=datetime.utcnow)
+    # Indexed for the /history range queries and incremental backup (index entries carry the rowid id)
+    created_at: Mapped[datetime] = mapped_column(nullable=False, default=datetime.utcnow, index=True)
     water_level: Mapped[float | None] = mapped_column(nullable=True)  # cm
     humidity: Mapped[float | None] = mapped_column(nullable=True)  # %
     air_temp: Mapped[float | None] = mapped_column(nullable=True)  # F
@@ -116,7 +118,8 @@ class PumpEvent(db.Model):
     __tablename__ = "pump_events"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    created_at: Mapped[datetime] = mapped_column(nullable=False, default=datetime.utcnow)
+    # Indexed for the /history range queries and incremental backup (index entries carry the rowid id)
+    created_at: Mapped[datetime] = mapped_column(nullable=False, default=datetime.utcnow, index=True)
     is_on: Mapped[bool] = mapped_column(nullable=False)  # True = turned on, False = turned off
     trigger: Mapped[str] = mapped_column(nullable=False)  # "manual" or "rule"
     rule_id: Mapped[str | None] = mapped_column(nullable=True)  # set when trigger is "rule"
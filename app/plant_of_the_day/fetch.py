@@ -1,19 +1,28 @@
 """
 Fetch a random plant from Perenual API and store as current plant of the day.
 """
-import json
 import logging
 import os
 import random
-import urllib.request
-import urllib.error
+from threading import Thread
+
+from app.lib import http_pool, json_codec
 
 from . import store
+from .slack_plant import _wikipedia_url
 
 logger = logging.getLogger(__name__)
 
 PERENUAL_BASE = "https://perenual.com/api/v2/species/details"
 
+_ALL_SPECIES_IDS = range(store.MIN_SPECIES_ID, store.MAX_SPECIES_ID + 1)
+# Perenual fields never shown or used: API links (care-guides embeds our key), the hardiness map
+# iframe HTML, and premium-only placeholders. Dropped before storing the plant.
+_DROP_KEYS = ("care-guides", "hardiness_location", "other_images", "pest_susceptibility_api")
+
+# Random draws before scanning for unused IDs (misses 64 in a row only when ~90%+ are used)
+_PICK_ATTEMPTS = 64
+
 
 def _get_api_key(app):
     """API key from env PLANT_API_KEY or app config."""
@@ -21,6 +30,22 @@ def _get_api_key(app):
     return key
 
 
+def _pick_unused_id(used):
+    """
+    Uniformly random species ID whose bit is clear in the used bitmap. Random draws usually hit an
+    unused ID at once; only a mostly-used bitmap falls through to scanning every ID.
+    """
+    for _ in range(_PICK_ATTEMPTS):
+        species_id = random.randrange(store.MIN_SPECIES_ID, store.MAX_SPECIES_ID + 1)
+        if not store.is_used(used, species_id):
+            return species_id
+    available = [i for i in _ALL_SPECIES_IDS if not store.is_used(used, i)]
+    if not available:
+        logger.info("Plant of the day: all species IDs used; resetting and retrying.")
+        available = _ALL_SPECIES_IDS
+    return random.choice(available)
+
+
 def fetch_plant_of_the_day(app):
     """
     Pick a random unused species ID (1–2999), fetch from Perenual API, store as current.
@@ -31,33 +56,49 @@ def fetch_plant_of_the_day(app):
         logger.debug("PLANT_API_KEY not set; skipping plant of the day fetch.")
         return
 
-    used = store.get_used_ids(app)
-    available = [i for i in range(store.MIN_SPECIES_ID, store.MAX_SPECIES_ID + 1) if i not in used]
-    if not available:
-        logger.info("Plant of the day: all species IDs used; resetting and retrying.")
-        used = set()
-        available = list(range(store.MIN_SPECIES_ID, store.MAX_SPECIES_ID + 1))
-
-    species_id = random.choice(available)
+    species_id = _pick_unused_id(store.get_used_bitmap(app))
     url = f"{PERENUAL_BASE}/{species_id}?key={api_key}"
 
     try:
-        req = urllib.request.Request(url, method="GET")
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        logger.warning("Plant of the day API HTTP error %s: %s", e.code, e.reason)
-        return
-    except urllib.error.URLError as e:
-        logger.warning("Plant of the day API URL error: %s", e.reason)
-        return
+        status, reason, body = http_pool.request("GET", url, timeout=15)
     except Exception as e:
         logger.warning("Plant of the day fetch failed: %s", e)
         return
+    if status != 200:
+        logger.warning("Plant of the day API HTTP error %s: %s", status, reason)
+        return
+    try:
+        data = json_codec.loads(body)
+    except ValueError as e:
+        logger.warning("Plant of the day API returned invalid JSON: %s", e)
+        return
 
     if not data or not isinstance(data, dict):
         return
+    for key in _DROP_KEYS:
+        data.pop(key, None)
 
     store.add_used_id(app, species_id)
     store.set_current_plant(app, data)
     logger.info("Plant of the day set to species_id=%s (%s)", species_id, data.get("common_name"))
+    # Wikipedia lookups can take seconds; store the URL with the plant once resolved
+    Thread(target=_resolve_wikipedia_url, args=(app, species_id), name="plant-wikipedia-url", daemon=True).start()
+
+
+def _resolve_wikipedia_url(app, species_id):
+    """
+    Add wikipedia_url to the stored plant, unless another species has replaced it meanwhile.
+    Nothing is stored when Wikipedia could not be checked, so the Slack send looks it up again.
+    """
+    plant = store.get_current_plant(app)
+    if plant is None:
+        return
+    try:
+        url = _wikipedia_url(plant, app, guess=False)
+    except Exception as e:
+        logger.warning("Wikipedia URL failed for plant of the day: %s", e)
+        return
+    if url is None:
+        logger.info("Wikipedia unreachable; plant of the day URL left unset")
+        return
+    store.update_current_plant(app, species_id, {"wikipedia_url": url})
@@ -4,7 +4,6 @@ import logging
 from flask import Blueprint, jsonify, current_app
 
 from . import store
-from .slack_plant import _wikipedia_url
 
 logger = logging.getLogger(__name__)
 plant_of_the_day_blueprint = Blueprint("plant_of_the_day", __name__)
@@ -12,14 +11,11 @@ plant_of_the_day_blueprint = Blueprint("plant_of_the_day", __name__)
 
 @plant_of_the_day_blueprint.route("", methods=["GET"])
 def get_plant_of_the_day():
-    """Return current plant of the day (full stored payload) or 404."""
+    """Return current plant of the day (full stored payload) or 404. Makes no outbound requests."""
     plant = store.get_current_plant(current_app)
     if plant is None:
         return jsonify({"error": "No plant of the day set"}), 404
-    out = dict(plant)
-    try:
-        out["wikipedia_url"] = _wikipedia_url(plant)
-    except Exception as e:
-        logger.warning("Wikipedia URL failed for plant of the day: %s", e)
-        out["wikipedia_url"] = None
-    return jsonify(out)
+    if "wikipedia_url" in plant:
+        return jsonify(plant)
+    # URL still being resolved after a fetch (or plant stored before it was saved with the payload)
+    return jsonify({**plant, "wikipedia_url": None})
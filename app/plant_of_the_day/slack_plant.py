@@ -2,11 +2,14 @@
 Send Plant of the Day to Slack at 9 AM: pun, name, image, and link.
 Uses same Slack webhook/settings as other notifications.
 """
-import json
 import logging
+import time
 import urllib.parse
-import urllib.request
-import urllib.error
+from functools import lru_cache
+from threading import Lock
+
+from app.alerts import slack
+from app.lib import http_pool, json_codec
 
 from . import store
 from .puns import pick_pun
@@ -16,49 +19,123 @@ logger = logging.getLogger(__name__)
 WIKI_BASE = "https://en.wikipedia.org/wiki/"
 WIKI_API = "https://en.wikipedia.org/w/api.php"
 
+# Article titles only change existence rarely; re-check after a week
+_WIKI_TTL = 7 * 24 * 3600
+# title (underscored) -> {"exists": bool, "ts": epoch seconds}; merged with instance/ copy on first use
+# Guarded by _wiki_titles_lock: the fetch's background URL resolver and the Slack send both use it
+_wiki_titles = {}
+_wiki_titles_loaded = False
+_wiki_titles_lock = Lock()
+
+
+@lru_cache(maxsize=256)
+def _canonicalize(title):
+    """
+    Normalize a wiki title once: (underscored title for API lookups, URL-quoted article path),
+    e.g. "Rosa 'Peace'" -> ("Rosa_'Peace'", "Rosa_%27Peace%27").
+    """
+    key = title.strip().replace(" ", "_")
+    return key, urllib.parse.quote(key, safe="/_")
+
 
 def _wiki_title_to_url(title):
     """Convert a wiki title (e.g. 'Cornus florida') to the article URL."""
     if not title or not title.strip():
         return WIKI_BASE + "Plant"
-    title = title.strip().replace(" ", "_")
-    return WIKI_BASE + urllib.parse.quote(title, safe="/_")
+    return WIKI_BASE + _canonicalize(title)[1]
 
 
-def _wikipedia_page_exists(title):
-    """Return True if a Wikipedia article exists for the given title (e.g. 'Cornus florida')."""
-    if not title or not title.strip():
-        return False
-    title = title.strip().replace(" ", "_")
-    url = f"{WIKI_API}?action=query&titles={urllib.parse.quote(title, safe='')}&format=json"
+def _probe_wikipedia_pages(titles):
+    """
+    Ask the Wikipedia API, in one request, whether articles exist for titles (underscored).
+    Returns {title: bool}, or None if the check failed.
+    """
+    joined = urllib.parse.quote("|".join(titles), safe="")
+    url = f"{WIKI_API}?action=query&titles={joined}&format=json"
     try:
-        req = urllib.request.Request(url, method="GET")
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-        pages = (data.get("query") or {}).get("pages") or {}
-        for page_id, page in pages.items():
-            if str(page_id) != "-1" and "missing" not in page:
-                return True
-        return False
+        status, _, body = http_pool.request("GET", url, timeout=5)
+        if status != 200:
+            logger.debug("Wikipedia API check for %r returned HTTP %s", titles, status)
+            return None
+        query = json_codec.loads(body).get("query") or {}
+        # The API answers under its normalized titles ('Cornus_florida' -> 'Cornus florida')
+        normalized = {n.get("from"): n.get("to") for n in query.get("normalized") or []}
+        found = {
+            page.get("title"): "missing" not in page and "invalid" not in page
+            for page in (query.get("pages") or {}).values()
+        }
+        return {t: found.get(normalized.get(t, t), False) for t in titles}
     except Exception as e:
-        logger.debug("Wikipedia API check failed for %r: %s", title, e)
-        return False
+        logger.debug("Wikipedia API check failed for %r: %s", titles, e)
+        return None
 
 
-def _wikipedia_url(plant):
+def _cached_wiki_title(app, title):
+    """Return the cached exists answer for title if younger than _WIKI_TTL, else None."""
+    global _wiki_titles_loaded
+    with _wiki_titles_lock:
+        if not _wiki_titles_loaded and app is not None:
+            for t, entry in store.get_wiki_titles(app).items():
+                if isinstance(entry, dict):
+                    _wiki_titles.setdefault(t, entry)
+            _wiki_titles_loaded = True
+        entry = _wiki_titles.get(title)
+    if entry is not None and time.time() - (entry.get("ts") or 0) < _WIKI_TTL:
+        return bool(entry.get("exists"))
+    return None
+
+
+def _remember_wiki_titles(app, answers):
+    """Cache {title: exists} answers, drop expired entries, and persist the cache if app is given."""
+    now = time.time()
+    with _wiki_titles_lock:
+        for title, exists in answers.items():
+            _wiki_titles[title] = {"exists": exists, "ts": now}
+        for t in [t for t, entry in _wiki_titles.items() if now - (entry.get("ts") or 0) >= _WIKI_TTL]:
+            del _wiki_titles[t]
+        if app is not None:
+            store.set_wiki_titles(app, dict(_wiki_titles))
+
+
+def _wikipedia_pages_exist(titles, app=None):
+    """Return {title: True if a Wikipedia article exists} for titles (e.g. ['Cornus florida', 'Cornus']).
+    Answers are cached for _WIKI_TTL (in instance/ too when app is given); titles not cached are
+    checked in a single API request. Titles that could not be checked answer None and are not cached.
+    """
+    keys = {t: _canonicalize(t)[0] for t in titles if t and t.strip()}
+    known = {}
+    for key in set(keys.values()):
+        exists = _cached_wiki_title(app, key)
+        if exists is not None:
+            known[key] = exists
+    missing = sorted(set(keys.values()) - known.keys())
+    if missing:
+        answers = _probe_wikipedia_pages(missing)
+        if answers is not None:
+            _remember_wiki_titles(app, answers)
+            known.update(answers)
+    return {t: known.get(keys.get(t)) for t in titles}
+
+
+def _wikipedia_url(plant, app=None, guess=True):
     """Build Wikipedia article URL from Perenual API genus + species_epithet (e.g. Cornus florida).
-    Uses only genus and species_epithet when both are present. Check genus+epithet first;
-    if that page exists, use it. If not, fall back to genus-only when that page exists.
+    Uses only genus and species_epithet when both are present. Both pages are checked in one request;
+    genus+epithet wins if it exists, else fall back to genus-only when that page exists.
+    Pass app to persist page-exists checks in instance/. With guess=False, return None instead of
+    a guessed URL when Wikipedia could not be checked.
     """
     genus = (plant.get("genus") or "").strip()
     epithet = (plant.get("species_epithet") or "").strip()
 
     if genus and epithet:
         species_title = f"{genus} {epithet}"
-        if _wikipedia_page_exists(species_title):
+        exists = _wikipedia_pages_exist([species_title, genus], app)
+        if exists[species_title]:
             return _wiki_title_to_url(species_title)
-        if _wikipedia_page_exists(genus):
+        if exists[genus]:
             return _wiki_title_to_url(genus)
+        if not guess and None in (exists[species_title], exists[genus]):
+            return None
         # API unreachable or both pages missing: epithet with apostrophe is usually cultivar → use genus
         if "'" in epithet:
             return _wiki_title_to_url(genus)
@@ -72,25 +149,26 @@ def _wikipedia_url(plant):
     # When we only have scientific_name/common_name (no genus/epithet in stored data):
     # try full title first; if it doesn't exist and title has multiple words, try first word (genus-like).
     if title and " " in title:
-        if not _wikipedia_page_exists(title):
-            first_word = title.split()[0]
-            if first_word and _wikipedia_page_exists(first_word):
-                return _wiki_title_to_url(first_word)
+        first_word = title.split()[0]
+        exists = _wikipedia_pages_exist([title, first_word], app)
+        if not exists[title] and exists[first_word]:
+            return _wiki_title_to_url(first_word)
+        if not guess and None in (exists[title], exists[first_word]):
+            return None
     return _wiki_title_to_url(title)
 
 
 def send_plant_of_the_day_slack(app):
     """Send current plant of the day to Slack if enabled. No-op if no plant or Slack off."""
-    with app.app_context():
-        from app.settings.routes import _get_or_create
-        row = _get_or_create()
-        if not getattr(row, "slack_notifications_enabled", True):
-            return
+    # One (cached) settings read covers both the enabled flag and the webhook URL
+    settings = slack._cached_settings(app)
+    if not settings.slack_notifications_enabled:
+        return
     plant = store.get_current_plant(app)
     if not plant:
         logger.debug("No plant of the day to send to Slack.")
         return
-    url = _get_webhook_url(app)
+    url = settings.webhook_url
     if not url:
         return
     common_name = (plant.get("common_name") or "Unknown plant").strip()
@@ -98,7 +176,7 @@ def send_plant_of_the_day_slack(app):
     default_img = plant.get("default_image")
     if isinstance(default_img, dict):
         image_url = (default_img.get("regular_url") or default_img.get("medium_url") or default_img.get("thumbnail") or "").strip()
-    more_url = _wikipedia_url(plant)
+    more_url = plant.get("wikipedia_url") or _wikipedia_url(plant, app)
     pun = pick_pun()
     text = f"{pun}\n\n*Plant of the day: {common_name}*\n<{more_url}|View on Wikipedia>"
     try:
@@ -109,24 +187,7 @@ def send_plant_of_the_day_slack(app):
                 {"type": "section", "text": {"type": "mrkdwn", "text": text}},
                 {"type": "image", "image_url": image_url, "alt_text": common_name},
             ]
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(body).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            pass
+        slack._post(url, body)
     except Exception as e:
         logger.warning("Plant of the day Slack send failed: %s", e)
 
-
-def _get_webhook_url(app):
-    with app.app_context():
-        from app.settings.routes import _get_or_create
-        row = _get_or_create()
-        w = (row.slack_webhook_url or "").strip() if getattr(row, "slack_webhook_url", None) else None
-        if w:
-            return w
-    import os
-    return (os.environ.get("SLACK_WEBHOOK_URL") or "").strip() or None
@@ -1,22 +1,36 @@
 """
 Persist current plant of the day and set of used species IDs.
-Files in instance/: plant_of_the_day_current.json, plant_of_the_day_used_ids.json
+Files in instance/: plant_of_the_day_current.json, plant_of_the_day_used.bin (bitmap of used IDs),
+wiki_title_cache.json (Wikipedia article-exists answers)
 """
-import json
 import logging
+import os
 from datetime import date
 from pathlib import Path
 from threading import Lock
 
+from app.lib import json_codec
+
 logger = logging.getLogger(__name__)
 
 CURRENT_FILENAME = "plant_of_the_day_current.json"
-USED_IDS_FILENAME = "plant_of_the_day_used_ids.json"
+USED_IDS_FILENAME = "plant_of_the_day_used_ids.json"  # pre-bitmap format, read once if no bitmap yet
+USED_BITMAP_FILENAME = "plant_of_the_day_used.bin"
+WIKI_TITLES_FILENAME = "wiki_title_cache.json"
 SLACK_SENT_PREFIX = "plant_of_the_day_slack_sent_"
+# Serializes writers (read-modify-write and the shared .tmp names); readers don't take it
 LOCK = Lock()
 
+# Date (ISO) whose Slack send this process has already claimed or found claimed
+_slack_claimed_date = None
+
+# Last parsed current plant: ((path, inode, mtime_ns), dict); other processes may replace the file
+_current_cache = None
+
 MIN_SPECIES_ID = 1
 MAX_SPECIES_ID = 2999
+# One bit per species ID 0..MAX_SPECIES_ID (bit 0 unused): 375 bytes
+_BITMAP_SIZE = MAX_SPECIES_ID // 8 + 1
 
 
 def _current_path(app):
@@ -27,69 +41,174 @@ def _used_ids_path(app):
     return Path(app.instance_path) / USED_IDS_FILENAME
 
 
-def _load_used_ids_unsafe(app):
-    """Load used IDs from file (caller must hold LOCK)."""
-    path = _used_ids_path(app)
-    if not path.exists():
-        return set()
+def _bitmap_path(app):
+    return Path(app.instance_path) / USED_BITMAP_FILENAME
+
+
+def is_used(bitmap, species_id):
+    """True if species_id's bit is set in a used-IDs bitmap."""
+    return bool(bitmap[species_id >> 3] >> (species_id & 7) & 1)
+
+
+def _bitmap_from_ids(ids):
+    bitmap = bytearray(_BITMAP_SIZE)
+    for i in ids:
+        if MIN_SPECIES_ID <= i <= MAX_SPECIES_ID:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return bitmap
+
+
+def _load_bitmap(app):
+    """
+    Load the used-IDs bitmap. Falls back to the old JSON list file (plant_of_the_day_used_ids.json)
+    if no bitmap has been written yet. No LOCK needed to read: writes replace the file atomically.
+    """
+    path = _bitmap_path(app)
     try:
-        with open(path, "r") as f:
-            data = json.load(f)
-        ids = set(data.get("ids") or [])
-        if len(ids) >= MAX_SPECIES_ID - MIN_SPECIES_ID + 1:
-            return set()
-        return ids
+        if path.exists():
+            data = path.read_bytes()
+            if len(data) == _BITMAP_SIZE:
+                return bytearray(data)
+            logger.warning("Ignoring used plant IDs bitmap %s with size %d", path, len(data))
+            return bytearray(_BITMAP_SIZE)
+        legacy = _used_ids_path(app)
+        if legacy.exists():
+            return _bitmap_from_ids(json_codec.loads(legacy.read_bytes()).get("ids") or [])
     except Exception as e:
         logger.warning("Could not load used plant IDs %s: %s", path, e)
-        return set()
+    return bytearray(_BITMAP_SIZE)
+
+
+def _atomic_write_bytes(path, data):
+    """
+    Write data to path via a synced temp file + os.replace, so readers see the old or the new
+    file, never a partial one. Caller must hold LOCK (one shared temp name per path).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _save_bitmap_unsafe(app, bitmap):
+    """Write the bitmap (caller must hold LOCK)."""
+    path = _bitmap_path(app)
+    try:
+        _atomic_write_bytes(path, bitmap)
+    except Exception as e:
+        logger.warning("Could not save used plant IDs %s: %s", path, e)
+
+
+def get_used_bitmap(app):
+    """Return used species IDs as a bytearray bitmap (bit i of byte i >> 3 set = ID i used); test with is_used()."""
+    return _load_bitmap(app)
 
 
 def get_used_ids(app):
     """Return set of species IDs already used for plant of the day."""
+    bitmap = get_used_bitmap(app)
+    return {i for i in range(MIN_SPECIES_ID, MAX_SPECIES_ID + 1) if is_used(bitmap, i)}
+
+
+def set_used_ids(app, ids):
+    """Replace the used species IDs (e.g. on backup restore)."""
     with LOCK:
-        return _load_used_ids_unsafe(app)
+        _save_bitmap_unsafe(app, _bitmap_from_ids(ids))
 
 
 def add_used_id(app, species_id):
     """Mark a species ID as used. If all IDs 1-2999 used, clear and start over."""
-    path = _used_ids_path(app)
     with LOCK:
-        ids = _load_used_ids_unsafe(app)
-        ids.add(species_id)
-        if len(ids) >= MAX_SPECIES_ID - MIN_SPECIES_ID + 1:
-            ids = set()
-        try:
-            path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, "w") as f:
-                json.dump({"ids": list(ids)}, f)
-        except Exception as e:
-            logger.warning("Could not save used plant IDs %s: %s", path, e)
+        bitmap = _load_bitmap(app)
+        bitmap[species_id >> 3] |= 1 << (species_id & 7)
+        if bin(int.from_bytes(bitmap, "little")).count("1") >= MAX_SPECIES_ID - MIN_SPECIES_ID + 1:
+            bitmap = bytearray(_BITMAP_SIZE)
+        _save_bitmap_unsafe(app, bitmap)
 
 
 def get_current_plant(app):
-    """Return current plant of the day dict, or None."""
+    """
+    Return current plant of the day dict, or None. The parsed file is reused until it is replaced
+    (the same dict is returned each time; callers must not modify it). No LOCK needed: writes
+    replace the file atomically.
+    """
+    global _current_cache
+    path = _current_path(app)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    key = (path, st.st_ino, st.st_mtime_ns)
+    cached = _current_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        data = json_codec.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Could not load current plant %s: %s", path, e)
+        return None
+    _current_cache = (key, data)
+    return data
+
+
+def set_current_plant(app, plant_data):
+    """Save current plant of the day (full API response or subset)."""
+    global _current_cache
     path = _current_path(app)
     with LOCK:
-        if not path.exists():
-            return None
         try:
-            with open(path, "r") as f:
-                return json.load(f)
+            _atomic_write_bytes(path, json_codec.dumps(plant_data))
+            _current_cache = None
         except Exception as e:
-            logger.warning("Could not load current plant %s: %s", path, e)
-            return None
+            logger.warning("Could not save current plant %s: %s", path, e)
 
 
-def set_current_plant(app, plant_data):
-    """Save current plant of the day (full API response or subset)."""
+def update_current_plant(app, species_id, changes):
+    """
+    Merge changes into the current plant if it is still species_id (read and write under LOCK, so a
+    newer plant stored meanwhile is never overwritten). Returns True if the plant was updated.
+    """
+    global _current_cache
     path = _current_path(app)
     with LOCK:
+        plant = get_current_plant(app)
+        if plant is None or plant.get("id", species_id) != species_id:
+            return False
         try:
-            path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, "w") as f:
-                json.dump(plant_data, f, indent=2)
+            _atomic_write_bytes(path, json_codec.dumps({**plant, **changes}))
+            _current_cache = None
         except Exception as e:
             logger.warning("Could not save current plant %s: %s", path, e)
+            return False
+    return True
+
+
+def get_wiki_titles(app):
+    """Return cached Wikipedia lookups as {title: {"exists": bool, "ts": epoch seconds}}."""
+    path = Path(app.instance_path) / WIKI_TITLES_FILENAME
+    try:
+        data = json_codec.loads(path.read_bytes())
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("Could not load Wikipedia title cache %s: %s", path, e)
+        return {}
+
+
+def set_wiki_titles(app, titles):
+    """Save Wikipedia lookups ({title: {"exists": bool, "ts": epoch seconds}})."""
+    path = Path(app.instance_path) / WIKI_TITLES_FILENAME
+    with LOCK:
+        try:
+            _atomic_write_bytes(path, json_codec.dumps(titles))
+        except Exception as e:
+            logger.warning("Could not save Wikipedia title cache %s: %s", path, e)
 
 
 def claim_plant_of_the_day_slack_sent_today(app):
@@ -98,14 +217,21 @@ def claim_plant_of_the_day_slack_sent_today(app):
     Uses exclusive file create (one file per date) so only one process sends per day.
     Returns True if this process won the claim (should send); False if already sent today.
     """
+    global _slack_claimed_date
     today_str = date.today().isoformat()
-    path = Path(app.instance_path) / f"{SLACK_SENT_PREFIX}{today_str}"
-    try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.open("x").close()
-        return True
-    except FileExistsError:
-        return False
-    except Exception as e:
-        logger.warning("Could not claim plant-of-the-day Slack sent date %s: %s", path, e)
-        return False
+    with LOCK:
+        # Once this process has claimed (or lost) today, later calls skip the filesystem
+        if _slack_claimed_date == today_str:
+            return False
+        path = Path(app.instance_path) / f"{SLACK_SENT_PREFIX}{today_str}"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.open("x").close()
+            _slack_claimed_date = today_str
+            return True
+        except FileExistsError:
+            _slack_claimed_date = today_str
+            return False
+        except Exception as e:
+            logger.warning("Could not claim plant-of-the-day Slack sent date %s: %s", path, e)
+            return False
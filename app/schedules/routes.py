@@ -1,9 +1,12 @@
 """
 REST API for schedule rules: list, create, update, delete.
-Also: pause light/pump rules for N minutes (server-side), and schedule manual pump off.
+Also: pause light/pump rules for N minutes (server-side, separately or together via /pause),
+and schedule manual pump off.
 """
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request
+
+from app.lib import json_codec
 
 from .store import (
     get_all_rules,
@@ -16,23 +19,24 @@ from .store import (
     set_light_rules_paused_until,
     set_pump_rules_paused_until,
     set_manual_pump_off_at,
+    set_pauses,
+    parse_hhmm,
 )
 
 schedule_blueprint = Blueprint("schedule", __name__)
 
 
+def _json(data, status=200):
+    """JSON response encoded with json_codec (orjson when installed) instead of jsonify."""
+    return current_app.response_class(json_codec.dumps(data), status=status, mimetype="application/json")
+
+
 def _normalize_time(s):
     """Normalize 'H:MM' or 'HH:MM' to 'HH:MM'."""
-    if not s or ":" not in s:
+    minutes = parse_hhmm(s)
+    if minutes is None:
         return None
-    parts = s.strip().split(":")
-    try:
-        h, m = int(parts[0]), int(parts[1])
-        if 0 <= h <= 23 and 0 <= m <= 59:
-            return "%02d:%02d" % (h, m)
-    except (ValueError, IndexError):
-        pass
-    return None
+    return "%02d:%02d" % divmod(minutes, 60)
 
 
 def _validate_light_rule(body):
@@ -85,11 +89,11 @@ def _validate_pump_rule(body):
 @schedule_blueprint.route("", methods=["GET"])
 def list_rules():
     """Return all rules and server-side pause-until times (for overlay UI)."""
-    return jsonify(
-        rules=get_all_rules(),
-        light_rules_paused_until=get_light_rules_paused_until(),
-        pump_rules_paused_until=get_pump_rules_paused_until(),
-    )
+    return _json({
+        "rules": get_all_rules(),
+        "light_rules_paused_until": get_light_rules_paused_until(),
+        "pump_rules_paused_until": get_pump_rules_paused_until(),
+    })
 
 
 @schedule_blueprint.route("/<rule_id>", methods=["GET"])
@@ -97,8 +101,8 @@ def get_one_rule(rule_id):
     """Return a single rule by id."""
     rule = get_rule(rule_id)
     if rule is None:
-        return jsonify(error="Rule not found"), 404
-    return jsonify(rule)
+        return _json({"error": "Rule not found"}, 404)
+    return _json(rule)
 
 
 @schedule_blueprint.route("", methods=["POST"])
@@ -109,16 +113,16 @@ def create_rule():
     if rule_type == "light":
         err, data = _validate_light_rule(body)
         if err:
-            return jsonify(error=err), 400
+            return _json({"error": err}, 400)
         rule = add_rule(data)
-        return jsonify(rule), 201
+        return _json(rule, 201)
     if rule_type == "pump":
         err, data = _validate_pump_rule(body)
         if err:
-            return jsonify(error=err), 400
+            return _json({"error": err}, 400)
         rule = add_rule(data)
-        return jsonify(rule), 201
-    return jsonify(error="type must be 'light' or 'pump'"), 400
+        return _json(rule, 201)
+    return _json({"error": "type must be 'light' or 'pump'"}, 400)
 
 
 @schedule_blueprint.route("/<rule_id>", methods=["PUT"])
@@ -126,23 +130,23 @@ def update_one_rule(rule_id):
     """Update an existing rule. Body: fields to update."""
     rule = get_rule(rule_id)
     if rule is None:
-        return jsonify(error="Rule not found"), 404
+        return _json({"error": "Rule not found"}, 404)
     body = request.get_json() or {}
     # Preserve type and validate by type
     rule_type = (body.get("type") or rule.get("type") or "").strip().lower()
     if rule_type == "light":
         err, data = _validate_light_rule({**rule, **body})
         if err:
-            return jsonify(error=err), 400
+            return _json({"error": err}, 400)
         updated = update_rule(rule_id, data)
-        return jsonify(updated)
+        return _json(updated)
     if rule_type == "pump":
         err, data = _validate_pump_rule({**rule, **body})
         if err:
-            return jsonify(error=err), 400
+            return _json({"error": err}, 400)
         updated = update_rule(rule_id, data)
-        return jsonify(updated)
-    return jsonify(error="type must be 'light' or 'pump'"), 400
+        return _json(updated)
+    return _json({"error": "type must be 'light' or 'pump'"}, 400)
 
 
 @schedule_blueprint.route("/<rule_id>", methods=["DELETE"])
@@ -150,7 +154,7 @@ def delete_one_rule(rule_id):
     """Delete a rule."""
     if delete_rule(rule_id):
         return "", 204
-    return jsonify(error="Rule not found"), 404
+    return _json({"error": "Rule not found"}, 404)
 
 
 def _parse_minutes(body, key="minutes", default=60, min_val=1, max_val=1440):
@@ -161,7 +165,7 @@ def _parse_minutes(body, key="minutes", default=60, min_val=1, max_val=1440):
             return None, n
     except (TypeError, ValueError):
         pass
-    return jsonify(error=f"{key} must be an integer between {min_val} and {max_val}"), None
+    return _json({"error": f"{key} must be an integer between {min_val} and {max_val}"}, 400), None
 
 
 @schedule_blueprint.route("/pause-light-rules", methods=["POST"])
@@ -170,7 +174,7 @@ def pause_light_rules():
     body = request.get_json() or {}
     err, minutes = _parse_minutes(body, default=60, max_val=1440)
     if err:
-        return err, 400
+        return err
     until = datetime.now() + timedelta(minutes=minutes)
     set_light_rules_paused_until(until.isoformat())
     return "", 204
@@ -182,19 +186,40 @@ def pause_pump_rules():
     body = request.get_json() or {}
     err, minutes = _parse_minutes(body, default=60, max_val=1440)
     if err:
-        return err, 400
+        return err
     until = datetime.now() + timedelta(minutes=minutes)
     set_pump_rules_paused_until(until.isoformat())
     return "", 204
 
 
+@schedule_blueprint.route("/pause", methods=["POST"])
+def pause_rules():
+    """
+    Pause light and/or pump rules in one call. Body: light_minutes, pump_minutes (either or both);
+    same effect as pause-light-rules + pause-pump-rules, with one store update.
+    """
+    body = request.get_json() or {}
+    now = datetime.now()
+    pauses = {}
+    for key, override in (("light_minutes", "light_rules_paused_until"), ("pump_minutes", "pump_rules_paused_until")):
+        if key in body:
+            err, minutes = _parse_minutes(body, key=key, max_val=1440)
+            if err:
+                return err
+            pauses[override] = (now + timedelta(minutes=minutes)).isoformat()
+    if not pauses:
+        return _json({"error": "light_minutes or pump_minutes is required"}, 400)
+    set_pauses(pauses)
+    return "", 204
+
+
 @schedule_blueprint.route("/manual-pump-off", methods=["POST"])
 def manual_pump_off():
     """Schedule pump to turn off in body.minutes. Scheduler will turn pump off at that time."""
     body = request.get_json() or {}
     err, minutes = _parse_minutes(body, default=5, max_val=120)
     if err:
-        return err, 400
+        return err
     off_at = datetime.now() + timedelta(minutes=minutes)
     set_manual_pump_off_at(off_at.isoformat())
     return "", 204
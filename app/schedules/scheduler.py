@@ -10,15 +10,16 @@ Server-side overrides (stored in schedule_rules.json):
 All rule times (start_time, end_time, time) are in device local time. Set the Pi's
 timezone to America/Chicago (Central) so rules match the times shown in the dashboard.
 """
+import heapq
 import logging
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from threading import Thread, Event
 
 from .store import (
-    get_all_rules,
-    get_light_rules_paused_until,
-    get_pump_rules_paused_until,
-    get_manual_pump_off_at,
+    get_compiled_rules,
+    load_rules,
+    parse_hhmm,
     set_manual_pump_off_at,
 )
 
@@ -28,10 +29,17 @@ logger = logging.getLogger(__name__)
 _light_control = None
 _pump_control = None
 
-# Pump off times: list of (datetime, rule_id) when we should turn pump off
+# Pump off times: min-heap of (datetime, rule_id) when we should turn pump off (earliest first)
 _pump_off_at = []
 _pump_off_lock = None
 
+# rule_id -> (date, minute since midnight) the rule last turned the pump on, so a rule fires
+# once in its minute however many ticks in that minute evaluate the rules
+_last_pump_fire_m = {}
+
+# Inputs of the last fully evaluated tick (see _tick); None forces a full evaluation
+_last_tick_key = None
+
 
 def _get_light_control():
     global _light_control
@@ -55,37 +63,18 @@ def _get_pump_control():
     return _pump_control
 
 
-def _parse_time(s):
-    """Parse 'HH:MM' or 'H:MM' to (hour, minute). Returns None if invalid."""
-    if not s or ":" not in s:
-        return None
-    parts = s.strip().split(":")
-    if len(parts) != 2:
-        return None
-    try:
-        h, m = int(parts[0]), int(parts[1])
-        if 0 <= h <= 23 and 0 <= m <= 59:
-            return (h, m)
-    except ValueError:
-        pass
-    return None
-
-
-def _time_in_minutes(hm):
-    """(hour, minute) -> minutes since midnight."""
-    if hm is None:
-        return -1
-    return hm[0] * 60 + hm[1]
-
-
 def _current_hm():
     """Current (hour, minute)."""
     now = datetime.now()
     return (now.hour, now.minute)
 
 
+@lru_cache(maxsize=8)
 def _parse_iso(s):
-    """Parse ISO datetime string to naive datetime, or None if invalid/None."""
+    """
+    Parse ISO datetime string to naive datetime, or None if invalid/None.
+    Cached: the same few pause/manual-off strings are parsed several times every tick.
+    """
     if not s:
         return None
     try:
@@ -96,35 +85,24 @@ def _parse_iso(s):
         return None
 
 
-def _apply_light_rules(now_hm):
-    """Compute desired brightness from all enabled light rules and apply. Last matching rule wins."""
-    until = _parse_iso(get_light_rules_paused_until())
+def _apply_light_rules(now_hm, state, compiled, control):
+    """
+    Compute desired brightness from all enabled light rules and apply. Last matching rule wins.
+    state is this tick's load_rules() result, compiled its get_compiled_rules(), control the light control (or None).
+    """
+    until = _parse_iso(state.get("light_rules_paused_until"))
     if until is not None and datetime.now() < until:
         return
-    rules = get_all_rules()
-    light_rules = [r for r in rules if r.get("type") == "light" and r.get("enabled", True) and not r.get("paused", False)]
-    if not light_rules:
+    if not compiled.light_start:
         return
 
-    now_m = _time_in_minutes(now_hm)
+    now_m = now_hm[0] * 60 + now_hm[1]
     desired = 0
-    # Sort by start so "last matching" is deterministic
-    for r in sorted(light_rules, key=lambda x: (x.get("start_time") or "")):
-        start = _parse_time(r.get("start_time"))
-        end = _parse_time(r.get("end_time")) if r.get("end_time") else None
-        brightness = r.get("brightness_pct", 0)
-        if start is None:
-            continue
-        start_m = _time_in_minutes(start)
-        if end is not None:
-            end_m = _time_in_minutes(end)
-            if start_m <= now_m < end_m:
-                desired = brightness
-        else:
-            # "Set and stay": active from start_time onward
-            if now_m >= start_m:
-                desired = brightness
-    control = _get_light_control()
+    # Compiled light rules are already sorted by start, so "last matching" is deterministic
+    for start_m, end_m, brightness in zip(compiled.light_start, compiled.light_end, compiled.light_brightness):
+        # end_m -1: "set and stay", active from start_time onward
+        if start_m <= now_m and (end_m < 0 or now_m < end_m):
+            desired = brightness
     if control is None:
         return
     try:
@@ -137,35 +115,39 @@ def _apply_light_rules(now_hm):
         logger.warning("Scheduler could not set light: %s", e)
 
 
-def _apply_pump_rules(now_dt, now_hm):
-    """Check pump rules for trigger time and scheduled off times."""
-    global _pump_off_at
+def _turn_off_due_pumps(now_dt, pump):
+    """Turn the pump off for rule runs whose off time has passed. pump is the pump control (or None)."""
     if _pump_off_lock is not None:
         _pump_off_lock.acquire()
     try:
-        # 1) Turn off any pumps that are due
-        still_pending = []
-        pump = _get_pump_control()
-        for off_at, rule_id in _pump_off_at:
-            if now_dt >= off_at:
-                if pump:
-                    try:
-                        pump.off()
-                        if _app is not None:
-                            from app.history import log_pump_event
-                            log_pump_event(_app, False, "rule", rule_id=rule_id)
-                        logger.info("Scheduler: pump off (rule %s)", rule_id)
-                    except Exception as e:
-                        logger.warning("Scheduler could not turn pump off: %s", e)
-            else:
-                still_pending.append((off_at, rule_id))
-        _pump_off_at = still_pending
+        events = []  # logged together after the loop
+        while _pump_off_at and _pump_off_at[0][0] <= now_dt:
+            off_at, rule_id = heapq.heappop(_pump_off_at)
+            if pump:
+                try:
+                    pump.off()
+                    events.append((False, "rule", rule_id))
+                    logger.info("Scheduler: pump off (rule %s)", rule_id)
+                except Exception as e:
+                    logger.warning("Scheduler could not turn pump off: %s", e)
+        if events and _app is not None:
+            from app.history import log_pump_events
+            log_pump_events(_app, events)
     finally:
         if _pump_off_lock is not None:
             _pump_off_lock.release()
 
+
+def _apply_pump_rules(now_dt, now_hm, state, compiled, pump):
+    """
+    Check pump rules for trigger time and scheduled off times.
+    state is this tick's load_rules() result, compiled its get_compiled_rules(), pump the pump control (or None).
+    """
+    # 1) Turn off any pumps that are due
+    _turn_off_due_pumps(now_dt, pump)
+
     # 2) If manual pump off time reached, turn pump off and clear
-    off_at = _parse_iso(get_manual_pump_off_at())
+    off_at = _parse_iso(state.get("manual_pump_off_at"))
     if off_at is not None and now_dt >= off_at:
         if pump:
             try:
@@ -179,46 +161,74 @@ def _apply_pump_rules(now_dt, now_hm):
         set_manual_pump_off_at(None)
 
     # 3) Fire pump rules at current time (unless pump rules are paused)
-    until = _parse_iso(get_pump_rules_paused_until())
+    until = _parse_iso(state.get("pump_rules_paused_until"))
     if until is not None and now_dt < until:
         return
-    rules = get_all_rules()
-    now_str = "%02d:%02d" % (now_hm[0], now_hm[1])
-    pump = _get_pump_control()
+    now_m = now_hm[0] * 60 + now_hm[1]
+    fire_m = (now_dt.date(), now_m)
     to_add = []
-    for r in rules:
-        if r.get("type") != "pump" or not r.get("enabled", True) or r.get("paused", False):
-            continue
-        if r.get("time") != now_str:
+    events = []  # logged together after the loop
+    for time_m, duration, rule_id in zip(compiled.pump_time, compiled.pump_duration, compiled.pump_id):
+        if time_m != now_m or _last_pump_fire_m.get(rule_id) == fire_m:
             continue
-        duration = int(r.get("duration_minutes") or 5)
         if pump:
             try:
                 pump.on()
                 pump.set_speed(100)
-                if _app is not None:
-                    from app.history import log_pump_event
-                    log_pump_event(_app, True, "rule", rule_id=r.get("id", ""))
+                events.append((True, "rule", rule_id))
                 off_at = now_dt + timedelta(minutes=duration)
-                to_add.append((off_at, r.get("id", "")))
-                logger.info("Scheduler: pump on for %s min (rule %s)", duration, r.get("id"))
+                to_add.append((off_at, rule_id))
+                _last_pump_fire_m[rule_id] = fire_m
+                logger.info("Scheduler: pump on for %s min (rule %s)", duration, rule_id)
             except Exception as e:
                 logger.warning("Scheduler could not turn pump on: %s", e)
+    if events and _app is not None:
+        from app.history import log_pump_events
+        log_pump_events(_app, events)
     if to_add and _pump_off_lock is not None:
         _pump_off_lock.acquire()
         try:
-            _pump_off_at.extend(to_add)
+            for item in to_add:
+                heapq.heappush(_pump_off_at, item)
         finally:
             _pump_off_lock.release()
     elif to_add:
-        _pump_off_at.extend(to_add)
+        for item in to_add:
+            heapq.heappush(_pump_off_at, item)
+
+
+def _is_before(iso, now_dt):
+    """True if iso (ISO datetime string or None) parses to a time after now_dt."""
+    until = _parse_iso(iso)
+    return until is not None and now_dt < until
 
 
 def _tick():
+    global _last_tick_key
     now_dt = datetime.now()
     now_hm = (now_dt.hour, now_dt.minute)
-    _apply_light_rules(now_hm)
-    _apply_pump_rules(now_dt, now_hm)
+    # One read of schedule_rules.json per tick for the pause/off overrides; rules are
+    # recompiled only when the file has changed
+    state = load_rules()
+    compiled = get_compiled_rules()
+    # Everything rule evaluation depends on; if unchanged since the last full tick (same minute,
+    # rules, pauses, manual-off not yet due), only scheduled pump-offs can have become due
+    manual_off = state.get("manual_pump_off_at")
+    key = (
+        now_hm,
+        compiled,
+        _is_before(state.get("light_rules_paused_until"), now_dt),
+        _is_before(state.get("pump_rules_paused_until"), now_dt),
+        manual_off is not None and not _is_before(manual_off, now_dt),
+    )
+    # Controls looked up once per tick and passed down
+    pump = _get_pump_control()
+    if key == _last_tick_key:
+        _turn_off_due_pumps(now_dt, pump)
+        return
+    _apply_light_rules(now_hm, state, compiled, _get_light_control())
+    _apply_pump_rules(now_dt, now_hm, state, compiled, pump)
+    _last_tick_key = key
 
 
 # How often the scheduler runs (seconds). Shorter = quicker reaction when pause expires.
@@ -268,19 +278,11 @@ def _scheduler_loop(stop_event):
 
 
 def _parse_plant_slack_time(time_str):
-    """Parse 'HH:MM' or 'H:MM' to (hour, minute) or None."""
-    if not time_str or ":" not in str(time_str):
+    """Parse 'HH:MM' or 'H:MM' to (hour, minute); (9, 35) if missing or invalid."""
+    minutes = parse_hhmm(time_str)
+    if minutes is None:
         return (9, 35)
-    parts = str(time_str).strip().split(":", 1)
-    if len(parts) != 2:
-        return (9, 35)
-    try:
-        h, m = int(parts[0]), int(parts[1])
-        if 0 <= h <= 23 and 0 <= m <= 59:
-            return (h, m)
-    except (ValueError, TypeError):
-        pass
-    return (9, 35)
+    return divmod(minutes, 60)
 
 
 def _run_plant_of_the_day_jobs():
@@ -12,6 +12,7 @@ import logging
 import os
 import threading
 import uuid
+from collections import namedtuple
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,17 @@ def _rules_path():
 
 _LOCK = threading.Lock()
 
+# Enabled, unpaused rules reduced to parallel tuples of ints for the scheduler's per-tick checks.
+# Light: start/end in minutes since midnight (end -1 = no end, stays on), brightness_pct; sorted by start.
+# Pump: trigger time in minutes since midnight, duration_minutes, rule id.
+CompiledRules = namedtuple(
+    "CompiledRules",
+    ["light_start", "light_end", "light_brightness", "pump_time", "pump_duration", "pump_id"],
+)
+
+# (file signature, CompiledRules) for the rules file as last compiled; reset by save_rules
+_compiled = None
+
 
 def _default_rules():
     return {
@@ -33,28 +45,45 @@ def _default_rules():
     }
 
 
+def _read_file(path):
+    """Rules and overrides as stored in path; caller holds _LOCK."""
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                rules = data.get("rules", [])
+                return {
+                    "rules": list(rules),
+                    "light_rules_paused_until": data.get("light_rules_paused_until"),
+                    "pump_rules_paused_until": data.get("pump_rules_paused_until"),
+                    "manual_pump_off_at": data.get("manual_pump_off_at"),
+                }
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning("Could not load rules from %s: %s", path, e)
+    return _default_rules()
+
+
+def _write_file(path, out):
+    """Write rules and overrides to path; caller holds _LOCK."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+    except OSError as e:
+        logger.error("Could not save rules to %s: %s", path, e)
+        raise
+
+
 def load_rules():
     """Load all rules and overrides from disk. Returns dict with 'rules' list and override keys."""
     path = _rules_path()
     with _LOCK:
-        try:
-            if os.path.exists(path):
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    rules = data.get("rules", [])
-                    return {
-                        "rules": list(rules),
-                        "light_rules_paused_until": data.get("light_rules_paused_until"),
-                        "pump_rules_paused_until": data.get("pump_rules_paused_until"),
-                        "manual_pump_off_at": data.get("manual_pump_off_at"),
-                    }
-        except (json.JSONDecodeError, OSError) as e:
-            logger.warning("Could not load rules from %s: %s", path, e)
-    return _default_rules()
+        return _read_file(path)
 
 
 def save_rules(data):
     """Save full state to disk. data should include 'rules' and override keys (callers pass load_rules() then modify)."""
+    global _compiled
     path = _rules_path()
     out = {
         "rules": data.get("rules", []),
@@ -64,12 +93,81 @@ def save_rules(data):
     }
     with _LOCK:
         try:
-            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(out, f, indent=2)
-        except OSError as e:
-            logger.error("Could not save rules to %s: %s", path, e)
-            raise
+            _write_file(path, out)
+        finally:
+            _compiled = None
+
+
+def _set_overrides(values):
+    """Update override keys (e.g. {"manual_pump_off_at": iso}) on disk in one locked read-modify-write."""
+    path = _rules_path()
+    with _LOCK:
+        data = _read_file(path)
+        data.update(values)
+        _write_file(path, data)
+
+
+def parse_hhmm(s):
+    """
+    'HH:MM' or 'H:MM' -> minutes since midnight, or None if invalid. A trailing ':SS' (as sent by
+    some time inputs) is accepted and ignored. Shared by the schedule API, the compiled rules, and the scheduler.
+    """
+    if not s:
+        return None
+    h, sep, rest = str(s).strip().partition(":")
+    m, has_seconds, sec = rest.partition(":")
+    if not (sep and h.isdecimal() and m.isdecimal()):
+        return None
+    if has_seconds and not (sec.isdecimal() and int(sec) <= 59):
+        return None
+    h, m = int(h), int(m)
+    if h <= 23 and m <= 59:
+        return h * 60 + m
+    return None
+
+
+def _compile_rules(rules):
+    light, pump = [], []
+    for r in rules:
+        if not r.get("enabled", True) or r.get("paused", False):
+            continue
+        if r.get("type") == "light":
+            start = parse_hhmm(r.get("start_time"))
+            if start is None:
+                continue
+            end = parse_hhmm(r.get("end_time")) if r.get("end_time") else None
+            light.append((start, -1 if end is None else end, r.get("brightness_pct", 0)))
+        elif r.get("type") == "pump":
+            time_m = parse_hhmm(r.get("time"))
+            if time_m is None:
+                continue
+            pump.append((time_m, int(r.get("duration_minutes") or 5), r.get("id", "")))
+    # Light rules ordered by start (stable, so ties keep file order): the scheduler's
+    # "last matching rule wins" scan relies on this
+    light.sort(key=lambda x: x[0])
+    light_cols = tuple(zip(*light)) or ((), (), ())
+    pump_cols = tuple(zip(*pump)) or ((), (), ())
+    return CompiledRules(*light_cols, *pump_cols)
+
+
+def get_compiled_rules():
+    """
+    Return CompiledRules for the current rules file. Recompiled only when the file changes
+    (checked with one stat per call) or after save_rules.
+    """
+    global _compiled
+    path = _rules_path()
+    try:
+        st = os.stat(path)
+        signature = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = (path, None)
+    cached = _compiled
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    compiled = _compile_rules(load_rules()["rules"])
+    _compiled = (signature, compiled)
+    return compiled
 
 
 def get_all_rules():
@@ -141,9 +239,7 @@ def get_light_rules_paused_until():
 
 def set_light_rules_paused_until(iso_datetime):
     """Set light rules paused until the given ISO datetime (or None to clear)."""
-    data = load_rules()
-    data["light_rules_paused_until"] = iso_datetime
-    save_rules(data)
+    _set_overrides({"light_rules_paused_until": iso_datetime})
 
 
 def get_pump_rules_paused_until():
@@ -153,9 +249,15 @@ def get_pump_rules_paused_until():
 
 def set_pump_rules_paused_until(iso_datetime):
     """Set pump rules paused until the given ISO datetime (or None to clear)."""
-    data = load_rules()
-    data["pump_rules_paused_until"] = iso_datetime
-    save_rules(data)
+    _set_overrides({"pump_rules_paused_until": iso_datetime})
+
+
+def set_pauses(pauses):
+    """
+    Set several overrides with one file write, e.g. {"light_rules_paused_until": iso, "pump_rules_paused_until": iso}
+    (None clears one).
+    """
+    _set_overrides(pauses)
 
 
 def get_manual_pump_off_at():
@@ -165,6 +267,4 @@ def get_manual_pump_off_at():
 
 def set_manual_pump_off_at(iso_datetime):
     """Set manual pump off time (or None to clear)."""
-    data = load_rules()
-    data["manual_pump_off_at"] = iso_datetime
-    save_rules(data)
+    _set_overrides({"manual_pump_off_at": iso_datetime})
@@ -130,4 +130,6 @@ def update_settings():
                 except (ValueError, TypeError):
                     pass
     db.session.commit()
+    from app.alerts.slack import invalidate_settings_cache
+    invalidate_settings_cache()
     return jsonify(row.to_dict())
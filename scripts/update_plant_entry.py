@@ -36,6 +36,8 @@ except ImportError:
 
 from app import create_app
 from app.plant_of_the_day import store
+from app.plant_of_the_day.fetch import _DROP_KEYS
+from app.plant_of_the_day.slack_plant import _wikipedia_url
 
 PERENUAL_BASE = "https://perenual.com/api/v2/species/details"
 
@@ -67,8 +69,14 @@ def main():
         print("Invalid API response.", file=sys.stderr)
         sys.exit(1)
 
+    for key in _DROP_KEYS:
+        data.pop(key, None)
     app = create_app("default")
     with app.app_context():
+        # Only store a URL Wikipedia confirmed; otherwise the Slack send resolves it later
+        wikipedia_url = _wikipedia_url(data, app, guess=False)
+        if wikipedia_url:
+            data["wikipedia_url"] = wikipedia_url
         store.set_current_plant(app, data)
 
     common = (data.get("common_name") or "").strip()
@@ -76,6 +84,7 @@ def main():
     epithet = (data.get("species_epithet") or "").strip()
     print(f"Updated plant-of-the-day to species ID {species_id}: {common!r}")
     print(f"  genus={genus!r}, species_epithet={epithet!r}")
+    print(f"  wikipedia_url={data.get('wikipedia_url') or '(not confirmed; resolved when sent)'}")
     print("  Stored at: instance/plant_of_the_day_current.json")
 
 
@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch
+import jwt
 from flask import json
 from app import create_app
 from parameterized import parameterized
@@ -193,5 +196,40 @@ class HumidityBlueprintTestCase(BaseTestCase):
         # Asserting that the response JSON contains the mocked humidity value
         self.assertEqual(response.get_json(), {"humidity": 45.6})
 
+class ScheduleBlueprintTestCase(BaseTestCase):
+
+    BASE_ROUTE = "/schedule/rules"
+
+    def setUp(self):
+        super().setUp()
+        # Keep schedule_rules.json out of the project root
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        env = patch.dict(os.environ, {"GARDYN_PROJECT_ROOT": self.tmpdir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        token = jwt.encode({"sub": "1"}, self.app.config["SECRET_KEY"], algorithm=self.app.config["JWT_ALGORITHM"])
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_pause_requires_a_duration(self):
+        response = self.client.post(f'{self.BASE_ROUTE}/pause', headers=self.headers, json={})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"error": "light_minutes or pump_minutes is required"})
+
+    def test_pause_rejects_out_of_range_minutes(self):
+        response = self.client.post(f'{self.BASE_ROUTE}/pause', headers=self.headers, json={"light_minutes": 0, "pump_minutes": 30})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"error": "light_minutes must be an integer between 1 and 1440"})
+
+    def test_pause_sets_both_pauses(self):
+        from app.schedules.store import load_rules
+
+        response = self.client.post(f'{self.BASE_ROUTE}/pause', headers=self.headers, json={"light_minutes": 30, "pump_minutes": 90})
+        self.assertEqual(response.status_code, 204)
+        data = load_rules()
+        self.assertIsNotNone(data["light_rules_paused_until"])
+        self.assertIsNotNone(data["pump_rules_paused_until"])
+        self.assertLess(data["light_rules_paused_until"], data["pump_rules_paused_until"])
+
 if __name__ == "__main__":
     unittest.main()
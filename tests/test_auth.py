@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import patch
+
+from app.auth import routes
+
+
+class ChallengeStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        for store in (routes._challenges, routes._latest_handle):
+            patcher = patch.dict(store, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_handle_round_trip(self):
+        handle = routes._store_challenge("registration", b"challenge", "grower@example.com")
+        self.assertEqual(routes._pop_challenge("registration", handle), (b"challenge", "grower@example.com"))
+        # Single use
+        self.assertIsNone(routes._pop_challenge("registration", handle))
+
+    def test_handle_for_other_kind_is_rejected(self):
+        registration = routes._store_challenge("registration", b"register")
+        routes._store_challenge("authentication", b"login")
+        self.assertIsNone(routes._pop_challenge("authentication", registration))
+        # The login's own challenge is still there
+        self.assertEqual(routes._pop_challenge("authentication", None), (b"login", None))
+
+    def test_expired_challenge_is_rejected(self):
+        with patch.object(routes.time, "monotonic", return_value=1000.0):
+            fresh = routes._store_challenge("authentication", b"fresh")
+            stale = routes._store_challenge("authentication", b"stale")
+        with patch.object(routes.time, "monotonic", return_value=1000.0 + routes._CHALLENGE_TTL - 1):
+            self.assertEqual(routes._pop_challenge("authentication", fresh), (b"fresh", None))
+        with patch.object(routes.time, "monotonic", return_value=1000.0 + routes._CHALLENGE_TTL):
+            self.assertIsNone(routes._pop_challenge("authentication", stale))
+
+    def test_without_handle_uses_newest_challenge_of_kind(self):
+        routes._store_challenge("registration", b"older")
+        routes._store_challenge("registration", b"newer")
+        routes._store_challenge("authentication", b"login")
+        self.assertEqual(routes._pop_challenge("registration", None), (b"newer", None))
+        # The fallback is used up with it; older challenges still need their handle
+        self.assertIsNone(routes._pop_challenge("registration", ""))
+        self.assertEqual(routes._pop_challenge("authentication", None), (b"login", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
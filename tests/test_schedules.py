@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from app.schedules import scheduler
+from app.schedules.store import _compile_rules
+
+
+def light(start, end, brightness, **kwargs):
+    return {"type": "light", "start_time": start, "end_time": end, "brightness_pct": brightness, **kwargs}
+
+
+def pump(time, duration=5, rule_id="p1", **kwargs):
+    return {"type": "pump", "time": time, "duration_minutes": duration, "id": rule_id, **kwargs}
+
+
+class CompileRulesTestCase(unittest.TestCase):
+
+    def test_disabled_and_paused_rules_are_dropped(self):
+        compiled = _compile_rules([
+            light("08:00", "20:00", 50),
+            light("09:00", "10:00", 10, enabled=False),
+            light("10:00", "11:00", 20, paused=True),
+            pump("07:30", rule_id="on"),
+            pump("07:45", rule_id="off", enabled=False),
+            pump("08:00", rule_id="paused", paused=True),
+        ])
+        self.assertEqual(compiled.light_start, (480,))
+        self.assertEqual(compiled.pump_id, ("on",))
+
+    def test_light_rules_sorted_by_start_keeping_file_order_for_ties(self):
+        compiled = _compile_rules([
+            light("12:00", "13:00", 90),
+            light("08:00", "20:00", 30),
+            light("08:00", "20:00", 70),
+        ])
+        self.assertEqual(compiled.light_start, (480, 480, 720))
+        self.assertEqual(compiled.light_brightness, (30, 70, 90))
+
+    def test_missing_end_time_compiles_to_no_end(self):
+        compiled = _compile_rules([light("06:00", None, 40)])
+        self.assertEqual(compiled.light_end, (-1,))
+
+    def test_pump_time_in_minutes(self):
+        compiled = _compile_rules([pump("7:05", duration=12)])
+        self.assertEqual(compiled.pump_time, (425,))
+        self.assertEqual(compiled.pump_duration, (12,))
+
+    def test_no_rules(self):
+        compiled = _compile_rules([])
+        self.assertEqual(compiled.light_start, ())
+        self.assertEqual(compiled.pump_time, ())
+
+
+class ApplyRulesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        for name, value in (("_app", None), ("_pump_off_at", []), ("_last_pump_fire_m", {})):
+            patcher = patch.object(scheduler, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # The pump pass can write manual-off changes; keep schedule_rules.json out of the project root
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        env = patch.dict(os.environ, {"GARDYN_PROJECT_ROOT": self.tmpdir.name})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_last_matching_light_rule_wins_on_equal_start(self):
+        control = MagicMock()
+        compiled = _compile_rules([light("08:00", "20:00", 30), light("08:00", "20:00", 70)])
+        scheduler._apply_light_rules((12, 0), {}, compiled, control)
+        control.set_brightness.assert_called_once_with(70)
+
+    def test_set_and_stay_light_rule(self):
+        control = MagicMock()
+        compiled = _compile_rules([light("06:00", None, 40)])
+        scheduler._apply_light_rules((23, 59), {}, compiled, control)
+        control.set_brightness.assert_called_once_with(40)
+        control.reset_mock()
+        scheduler._apply_light_rules((5, 59), {}, compiled, control)
+        control.off.assert_called_once()
+
+    def test_light_off_after_end(self):
+        control = MagicMock()
+        compiled = _compile_rules([light("08:00", "20:00", 50)])
+        scheduler._apply_light_rules((20, 0), {}, compiled, control)
+        control.off.assert_called_once()
+        control.set_brightness.assert_not_called()
+
+    def test_pump_rule_fires_only_in_its_minute(self):
+        control = MagicMock()
+        compiled = _compile_rules([pump("07:30", duration=10)])
+        scheduler._apply_pump_rules(datetime(2026, 5, 1, 7, 29), (7, 29), {}, compiled, control)
+        control.on.assert_not_called()
+        scheduler._apply_pump_rules(datetime(2026, 5, 1, 7, 30), (7, 30), {}, compiled, control)
+        control.on.assert_called_once()
+        self.assertEqual(scheduler._pump_off_at, [(datetime(2026, 5, 1, 7, 40), "p1")])
+
+    def test_pump_rule_fires_once_per_minute(self):
+        control = MagicMock()
+        compiled = _compile_rules([pump("07:30")])
+        for second in (0, 15, 30):
+            scheduler._apply_pump_rules(datetime(2026, 5, 1, 7, 30, second), (7, 30), {}, compiled, control)
+        control.on.assert_called_once()
+        self.assertEqual(len(scheduler._pump_off_at), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
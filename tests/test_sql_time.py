@@ -0,0 +1,84 @@
+import unittest
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, Table, create_engine, func, insert, select
+
+from app.lib.sql_time import bucket_utc, iso_utc
+
+
+class SqlTimeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        metadata = MetaData()
+        self.readings = Table(
+            "readings",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("created_at", DateTime),
+            Column("humidity", Float),
+        )
+        metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+
+class IsoUtcTestCase(SqlTimeTestCase):
+
+    def test_matches_isoformat(self):
+        times = [
+            datetime(2026, 3, 1, 12, 30, 5),
+            datetime(2026, 3, 1, 12, 30, 5, 1),
+            datetime(2026, 3, 1, 12, 30, 5, 500),
+            datetime(2026, 3, 1, 12, 30, 5, 120000),
+            datetime(2026, 12, 31, 23, 59, 59, 999999),
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.readings), [{"created_at": t} for t in times])
+            rows = conn.execute(select(iso_utc(self.readings.c.created_at)).order_by(self.readings.c.id)).all()
+        self.assertEqual([r[0] for r in rows], [t.isoformat() + "Z" for t in times])
+
+    def test_labeled_with_column_name(self):
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.readings), [{"created_at": datetime(2026, 3, 1)}])
+            row = conn.execute(select(iso_utc(self.readings.c.created_at))).one()
+        self.assertEqual(row._mapping["created_at"], "2026-03-01T00:00:00Z")
+
+
+class BucketUtcTestCase(SqlTimeTestCase):
+
+    def test_averages_per_bucket(self):
+        # Grouped the way the history API groups month/year ranges: if GROUP BY used the raw
+        # created_at column (the label's name) instead of the bucket, no rows would be averaged
+        rows = [
+            (datetime(2026, 3, 1, 12, 0, 0), 40.0),
+            (datetime(2026, 3, 1, 12, 5, 0, 250000), 50.0),
+            (datetime(2026, 3, 1, 12, 14, 59), 60.0),
+            (datetime(2026, 3, 1, 12, 15, 0), 70.0),
+            (datetime(2026, 3, 1, 13, 2, 0), 80.0),
+        ]
+        bucket = bucket_utc(self.readings.c.created_at, 15 * 60)
+        stmt = select(bucket, func.avg(self.readings.c.humidity)).group_by(bucket).order_by(bucket)
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.readings), [{"created_at": t, "humidity": h} for t, h in rows])
+            result = conn.execute(stmt).all()
+        self.assertEqual(
+            [tuple(r) for r in result],
+            [
+                ("2026-03-01T12:00:00Z", 50.0),
+                ("2026-03-01T12:15:00Z", 70.0),
+                ("2026-03-01T13:00:00Z", 80.0),
+            ],
+        )
+
+    def test_labeled_with_column_name(self):
+        bucket = bucket_utc(self.readings.c.created_at, 60 * 60)
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.readings), [{"created_at": datetime(2026, 3, 1, 9, 59), "humidity": 1.0}])
+            row = conn.execute(select(bucket)).one()
+        self.assertEqual(row._mapping["created_at"], "2026-03-01T09:00:00Z")
+
+
+if __name__ == "__main__":
+    unittest.main()